@@ -0,0 +1,117 @@
+import asyncio
+import sys
+import time
+
+from mysql.connector.aio.pooling import MySQLConnectionPool
+from pymongo import AsyncMongoClient
+
+#   Runs a suite of independent read queries concurrently instead of one after another.
+#   A suite is a list of (label, query) pairs, where a query is a zero-argument coroutine function
+#   built by sqlQuery/mongoFind/mongoAggregate. At most `concurrency` queries are in flight at
+#   once, results come back in suite order, and the report compares the wall time of the suite
+#   with the sum of the per-query latencies (what running them back to back would have cost).
+#
+#   MySQL goes through mysql.connector.aio, over a pool of connections with one query on each at
+#   a time (the pool must be at least as large as the concurrency, it does not wait for a free
+#   connection); MongoDB through pymongo's AsyncMongoClient, which multiplexes over its own pool.
+#   Both ship with the drivers already used by the sync code.
+
+DEFAULT_CONCURRENCY = 8
+
+
+async def mysqlPool(host: str, user: str, password: str, database: str, port: int = 3306, size: int = DEFAULT_CONCURRENCY):
+    pool = MySQLConnectionPool(pool_size=size, host=host, user=user, password=password, database=database, port=port)
+    await pool.initialize_pool()
+    return pool
+
+def mongoCollection(host: str, port: str, user: str, password: str, database: str, collection: str):
+    client = AsyncMongoClient(f"mongodb://{user}:{password}@{host}:{port}/?authSource=admin")
+    return client[database][collection]
+
+#-------------------------------------------------------------------------------------------------#
+
+def sqlQuery(pool: MySQLConnectionPool, sql: str, params: tuple | dict | None = None):
+    async def run():
+        connection = await pool.get_connection()
+        try:
+            cursor = await connection.cursor()
+            try:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+            finally:
+                await cursor.close()
+        finally:
+            await connection.close()
+    return run
+
+def mongoFind(col, filter: dict, projection: dict | None = None, sort: list[tuple[str, int]] | None = None, limit: int = 0):
+    async def run():
+        cursor = col.find(filter, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list()
+    return run
+
+def mongoAggregate(col, pipeline: list[dict]):
+    async def run():
+        cursor = await col.aggregate(pipeline)
+        return await cursor.to_list()
+    return run
+
+#-------------------------------------------------------------------------------------------------#
+
+async def timed(semaphore: asyncio.Semaphore, query):
+    async with semaphore:
+        start = time.perf_counter()
+        result = await query()
+        return result, time.perf_counter() - start
+
+async def runSuite(suite: list[tuple[str, object]], concurrency: int = DEFAULT_CONCURRENCY):
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(timed(semaphore, query) for _, query in suite))
+    wall = time.perf_counter() - start
+
+    results = [result for result, _ in outcomes]
+    latencies = [(label, latency) for (label, _), (_, latency) in zip(suite, outcomes)]
+    summed = sum(latency for _, latency in latencies)
+    report = {
+        "queries": len(suite),
+        "concurrency": concurrency,
+        "wall": wall,
+        "summed_latency": summed,
+        "saved": summed - wall,
+        "speedup": summed / wall if wall else 0.0,
+        "latencies": latencies,
+    }
+    return results, report
+
+def printReport(report: dict):
+    for label, latency in report["latencies"]:
+        print(f"{label}: {latency * 1000:.2f} ms")
+    print(f"{report['queries']} queries, concurrency {report['concurrency']}: wall {report['wall'] * 1000:.2f} ms, "
+          f"summed latency {report['summed_latency'] * 1000:.2f} ms, saved {report['saved'] * 1000:.2f} ms ({report['speedup']:.2f}x)")
+
+#-------------------------------------------------------------------------------------------------#
+
+#   The same point lookups by name, submitted one at a time (concurrency 1) and overlapped.
+async def benchmarkAsync(host: str, user: str, password: str, database: str, lookups: int, concurrencies: list[int]):
+    pool = await mysqlPool(host, user, password, database, size=max(concurrencies))
+    try:
+        names = [row[0] for row in await sqlQuery(pool, "SELECT name FROM star_clusters")()]
+        suite = [(f"lookup {i}", sqlQuery(pool, "SELECT * FROM star_clusters WHERE name = %s", (names[i % len(names)],)))
+                 for i in range(lookups)]
+        for concurrency in concurrencies:
+            _, report = await runSuite(suite, concurrency)
+            print(f"concurrency {concurrency}: wall {report['wall']:.2f}s, summed latency {report['summed_latency']:.2f}s ({report['speedup']:.2f}x)")
+    finally:
+        await pool.close_pool()
+
+def benchmark(host: str, user: str, password: str, database: str, lookups: int = 1000, concurrencies: list[int] = [1, 4, 8]):
+    asyncio.run(benchmarkAsync(host, user, password, database, lookups, concurrencies))
+
+if __name__ == "__main__":
+    host, user, password, database = (sys.argv[1:5] + ["localhost", "root", "root", "astro_database"][len(sys.argv[1:5]):])
+    benchmark(host, user, password, database)
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from pymongo import DeleteMany, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult
+
+from common.bulkload import insertChunked, placeholder
+from common.catalogue import applySchema, cleanCatalogue, syntheticCatalogue
+from common.querycache import invalidateCollection, invalidateTable
+from common.results import dbapiConnection
+from common.schema import mysqlType
+from common.views import deleteRecorded, recordDeletes, stampUpdate, writeStamp
+
+#   Set-based mutations keyed by cluster name, one statement per chunk of names instead of one
+#   round trip per row:
+#   - updateByName    UPDATE ... SET column = CASE name WHEN ... THEN ... END WHERE name IN (...)
+#   - deleteByName    DELETE ... WHERE name IN (...)
+#   Past STAGING_THRESHOLD names both go through a temporary staging table instead, bulk loaded
+#   and joined against the target in a single statement.
+#   Works on mysql.connector and sqlite3 connections (pooled or SQLAlchemy-wrapped ones are
+#   unwrapped); committing is left to the caller, as with the single-row helpers.
+#
+#   The MongoDB counterparts send the same batches through bulk_write / delete_many, with the
+#   updates stamped for the views of common.views.
+
+DEFAULT_CHUNK_SIZE = 1000
+STAGING_THRESHOLD = 50_000
+STAGING_TABLE = "name_staging"
+
+
+def isSqliteCursor(cursor):
+    return isinstance(cursor, sqlite3.Cursor)
+
+def nameChunks(names: list, chunkSize: int):
+    for start in range(0, len(names), chunkSize):
+        yield names[start:start + chunkSize]
+
+def createStaging(cursor, keys: pd.Series, values: pd.Series | None = None):
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}" if not isSqliteCursor(cursor) else f"DROP TABLE IF EXISTS temp.{STAGING_TABLE}")
+    columns = f"name {mysqlType(keys)} PRIMARY KEY" + ("" if values is None else f", value {mysqlType(values)}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {STAGING_TABLE} ({columns})")
+    frame = pd.DataFrame({"name": keys} if values is None else {"name": keys, "value": values})
+    insertChunked(cursor, frame, STAGING_TABLE, DEFAULT_CHUNK_SIZE)
+
+def dropStaging(cursor):
+    cursor.execute(f"DROP TABLE {STAGING_TABLE}" if isSqliteCursor(cursor) else f"DROP TEMPORARY TABLE {STAGING_TABLE}")
+
+#-------------------------------------------------------------------------------------------------#
+
+def updateByName(connection, values: dict, column: str = "age", table: str = "star_clusters", chunkSize: int = DEFAULT_CHUNK_SIZE):
+    cursor = dbapiConnection(connection).cursor()
+    try:
+        if len(values) >= STAGING_THRESHOLD:
+            createStaging(cursor, pd.Series(list(values.keys())), pd.Series(list(values.values())))
+            if isSqliteCursor(cursor):
+                cursor.execute(f"UPDATE {table} SET {column} = s.value FROM {STAGING_TABLE} s WHERE {table}.name = s.name")
+            else:
+                cursor.execute(f"UPDATE {table} t JOIN {STAGING_TABLE} s ON t.name = s.name SET t.{column} = s.value")
+            updated = cursor.rowcount
+            dropStaging(cursor)
+            return updated
+
+        p = placeholder(cursor)
+        updated = 0
+        for chunk in nameChunks(list(values.items()), chunkSize):
+            cases = " ".join([f"WHEN {p} THEN {p}"] * len(chunk))
+            names = ", ".join([p] * len(chunk))
+            params = [item for pair in chunk for item in pair] + [name for name, _ in chunk]
+            cursor.execute(f"UPDATE {table} SET {column} = CASE name {cases} END WHERE name IN ({names})", params)
+            updated += cursor.rowcount
+        return updated
+    finally:
+        cursor.close()
+        invalidateTable(table)
+
+def deleteByName(connection, names: list[str], table: str = "star_clusters", chunkSize: int = DEFAULT_CHUNK_SIZE):
+    cursor = dbapiConnection(connection).cursor()
+    try:
+        if len(names) >= STAGING_THRESHOLD:
+            createStaging(cursor, pd.Series(list(dict.fromkeys(names))))
+            if isSqliteCursor(cursor):
+                cursor.execute(f"DELETE FROM {table} WHERE name IN (SELECT name FROM {STAGING_TABLE})")
+            else:
+                cursor.execute(f"DELETE t FROM {table} t JOIN {STAGING_TABLE} s ON t.name = s.name")
+            deleted = cursor.rowcount
+            dropStaging(cursor)
+            return deleted
+
+        p = placeholder(cursor)
+        deleted = 0
+        for chunk in nameChunks(list(names), chunkSize):
+            cursor.execute(f"DELETE FROM {table} WHERE name IN ({', '.join([p] * len(chunk))})", chunk)
+            deleted += cursor.rowcount
+        return deleted
+    finally:
+        cursor.close()
+        invalidateTable(table)
+
+#-------------------------------------------------------------------------------------------------#
+
+#   updates maps a name to its update document, e.g. {"NGC_188": {"$set": {"features.age": 9.8}}}.
+def mongoUpdateByName(col, updates: dict, chunkSize: int = DEFAULT_CHUNK_SIZE, field: str = "name"):
+    modified = 0
+    stamp = writeStamp(col)
+    for chunk in nameChunks(list(updates.items()), chunkSize):
+        result = col.bulk_write([UpdateOne({field: name}, stampUpdate(update, stamp)) for name, update in chunk], ordered=False)
+        modified += result.modified_count
+    invalidateCollection(col)
+    return modified
+
+def mongoDeleteByName(col, names: list[str], chunkSize: int = DEFAULT_CHUNK_SIZE, field: str = "name"):
+    deleted = 0
+    for chunk in nameChunks(list(names), chunkSize):
+        deleted += deleteRecorded(col, {field: {"$in": chunk}})
+    invalidateCollection(col)
+    return deleted
+
+#   Several update_many/delete_many calls as one ordered bulk_write round trip. On a collection
+#   with views (common.views) the deleted _ids are needed for the tombstones: the updates go first,
+#   then the documents the delete queries match are deleted by _id, and the results are combined.
+def mongoBulkWrite(col, updates: list[tuple[dict, dict]] = [], deletes: list[dict] = []):
+    stamp = writeStamp(col)
+    operations = [UpdateMany(query, stampUpdate(operation, stamp)) for query, operation in updates]
+    try:
+        if not deletes or stamp is None:
+            return col.bulk_write(operations + [DeleteMany(query) for query in deletes], ordered=True)
+        results = [col.bulk_write(operations, ordered=True)] if operations else []
+        ids = [doc["_id"] for doc in col.find({"$or": deletes}, {"_id": 1})]
+        results.append(col.bulk_write([DeleteMany({"_id": {"$in": ids}})], ordered=True))
+        recordDeletes(col, ids, stamp)
+        return combinedResult(results)
+    finally:
+        invalidateCollection(col)
+
+def combinedResult(results: list):
+    combined = {}
+    for result in results:
+        for key, value in result.bulk_api_result.items():
+            combined[key] = combined.get(key, [] if isinstance(value, list) else 0) + value
+    return BulkWriteResult(combined, acknowledged=True)
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Updates/s and deletes/s of the per-row statements against the batched ones, on a synthetic
+#   catalogue in SQLite.
+def benchmark(sizes: list[int], seed: int = 0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        df = cleanCatalogue(applySchema(syntheticCatalogue(size, seed=seed)))[["name", "age"]]
+        df["name"] = df["name"].astype(str)
+        ages = dict(zip(df["name"], rng.uniform(6, 10, size).round(3)))
+        names = list(df["name"].iloc[rng.permutation(size)[:size // 2]])
+
+        for mode in ("per-row", "batched"):
+            handle, path = tempfile.mkstemp(suffix=".db")
+            os.close(handle)
+            connection = sqlite3.connect(path)
+            try:
+                connection.execute("CREATE TABLE star_clusters (name TEXT PRIMARY KEY, age REAL)")
+                connection.executemany("INSERT INTO star_clusters VALUES (?, ?)", df.itertuples(index=False, name=None))
+                connection.commit()
+
+                start = time.perf_counter()
+                if mode == "per-row":
+                    for name, age in ages.items():
+                        connection.execute("UPDATE star_clusters SET age = ? WHERE name = ?", (age, name))
+                        connection.commit()
+                else:
+                    updateByName(connection, ages)
+                    connection.commit()
+                updateTime = time.perf_counter() - start
+
+                start = time.perf_counter()
+                if mode == "per-row":
+                    for name in names:
+                        connection.execute("DELETE FROM star_clusters WHERE name = ?", (name,))
+                        connection.commit()
+                else:
+                    deleteByName(connection, names)
+                    connection.commit()
+                deleteTime = time.perf_counter() - start
+
+                left = connection.execute("SELECT COUNT(*) FROM star_clusters").fetchone()[0]
+                assert left == size - len(names), f"{mode}: {left} rows left"
+            finally:
+                connection.close()
+                os.remove(path)
+
+            results.append({"rows": size, "mode": mode, "updates/s": size / updateTime, "deletes/s": len(names) / deleteTime})
+            print(results[-1])
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    sizes = [int(float(s)) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(benchmark(sizes).to_string(index=False))
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+#   One bin specification, three backends.
+#   A BinSpec turns a numeric column into a categorical with np.searchsorted/pd.cut semantics,
+#   and renders the very same bins as a MySQL CASE expression and a MongoDB $switch, so
+#   pandas, MySQL and MongoDB never disagree on which bin a value falls in.
+#
+#   edges     sorted bin boundaries
+#   labels    one per bin: len(edges) - 1, plus one for each open end
+#   closed    "right" for (a, b] bins, "left" for [a, b), or one of the two per edge, saying
+#             which side's bin the edge value itself belongs to ("right" = the bin below it)
+#   lowerOpen / upperOpen
+#             whether values below the first / above the last edge get their own bin;
+#             otherwise they are labelled outsideLabel
+#   nanLabel  label for missing values (None leaves them missing)
+
+
+class BinSpec:
+    def __init__(self, edges: list[float], labels: list[str], closed: str | list[str] = "right",
+                 lowerOpen: bool = True, upperOpen: bool = True, nanLabel: str | None = "Unknown",
+                 outsideLabel: str | None = None):
+        edges = list(edges)
+        closed = [closed] * len(edges) if isinstance(closed, str) else list(closed)
+        if any(a >= b for a, b in zip(edges, edges[1:])):
+            raise ValueError("Bin edges must be strictly increasing")
+        if len(closed) != len(edges) or set(closed) - {"left", "right"}:
+            raise ValueError("closed must be 'left', 'right' or one of them per edge")
+        if len(labels) != len(edges) - 1 + lowerOpen + upperOpen:
+            raise ValueError(f"Expected {len(edges) - 1 + lowerOpen + upperOpen} labels, got {len(labels)}")
+
+        self.edges = edges
+        self.labels = list(labels)
+        self.closed = closed
+        self.lowerOpen = lowerOpen
+        self.upperOpen = upperOpen
+        self.nanLabel = nanLabel
+        self.outsideLabel = outsideLabel if outsideLabel is not None else nanLabel
+
+    def categories(self):
+        extra = [label for label in (self.nanLabel, self.outsideLabel) if label is not None]
+        return self.labels + [label for label in dict.fromkeys(extra) if label not in self.labels]
+
+    #   Number of edges each value has passed: x passes an edge e when x > e, or x >= e when e
+    #   belongs to the bin above it (closed="left").
+    def edgesPassed(self, values: np.ndarray):
+        if len(set(self.closed)) == 1:
+            side = "right" if self.closed[0] == "left" else "left"
+            return np.searchsorted(self.edges, values, side=side)
+        passed = np.zeros(len(values), dtype=np.intp)
+        for edge, closed in zip(self.edges, self.closed):
+            passed += (values >= edge) if closed == "left" else (values > edge)
+        return passed
+
+    def apply(self, values: pd.Series):
+        data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(data)
+        passed = self.edgesPassed(np.where(missing, 0, data))
+
+        codes = passed - (0 if self.lowerOpen else 1)
+        outside = (codes < 0) | (codes >= len(self.labels))
+
+        categories = self.categories()
+        position = {label: i for i, label in enumerate(categories)}
+        codes = np.where(outside, position.get(self.outsideLabel, -1), codes)
+        codes = np.where(missing, position.get(self.nanLabel, -1), codes)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories, ordered=True), index=values.index, name=values.name)
+
+    #---------------------------------------------------------------------------------------------#
+
+    #   (label, upper edge, whether the edge is inclusive) for each bin from the lowest, with None
+    #   as the upper edge of the last bin. Both renderers emit the bins as a cascade of < / <=.
+    def cascade(self):
+        steps = []
+        if not self.lowerOpen:
+            steps.append((self.outsideLabel, self.edges[0], self.closed[0] == "right"))
+        bins = iter(self.labels)
+        if self.lowerOpen:
+            steps.append((next(bins), self.edges[0], self.closed[0] == "right"))
+        for edge, closed in zip(self.edges[1:], self.closed[1:]):
+            steps.append((next(bins), edge, closed == "right"))
+        if self.upperOpen:
+            steps.append((next(bins), None, False))
+        else:
+            steps.append((self.outsideLabel, None, False))
+        return steps
+
+    def sqlCase(self, column: str):
+        def literal(label):
+            return "NULL" if label is None else "'" + label.replace("'", "''") + "'"
+
+        lines = ["CASE"]
+        if self.nanLabel is not None:
+            lines.append(f"    WHEN {column} IS NULL THEN {literal(self.nanLabel)}")
+        for label, edge, inclusive in self.cascade()[:-1]:
+            lines.append(f"    WHEN {column} {'<=' if inclusive else '<'} {edge!r} THEN {literal(label)}")
+        lines.append(f"    ELSE {literal(self.cascade()[-1][0])}")
+        lines.append("END")
+        return "\n".join(lines)
+
+    def mongoSwitch(self, field: str):
+        branches = []
+        if self.nanLabel is not None:
+            #   Missing fields, nulls and NaN would otherwise compare below every number.
+            branches.append({
+                "case": { "$or": [
+                    { "$eq": [{ "$ifNull": [field, None] }, None] },
+                    { "$eq": [field, float("nan")] }
+                ] },
+                "then": self.nanLabel
+            })
+        for label, edge, inclusive in self.cascade()[:-1]:
+            branches.append({ "case": { "$lte" if inclusive else "$lt": [field, edge] }, "then": label })
+        return { "$switch": { "branches": branches, "default": self.cascade()[-1][0] } }
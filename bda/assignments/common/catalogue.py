@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    SNAPSHOT_FORMAT = "parquet"
+except ImportError:
+    SNAPSHOT_FORMAT = "pickle"
+
+CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dias_catalogue.csv")
+
+#   Declared dtypes for the Dias catalogue.
+#   Astrometric and photometric columns are published with at most 3-4 decimals and stay well
+#   within float32's ~7 significant digits. likelihood and BIC keep float64 since they reach
+#   large magnitudes and carry +-inf. Counts, flags and references fit in small integers; a
+#   column that turns out to have nulls is given the matching nullable integer dtype instead.
+CATALOGUE_SCHEMA = {
+    "name": "category",
+    "RA_ICRS": "float32",
+    "DE_ICRS": "float32",
+    "r50": "float32",
+    "r50_arcmin": "float32",
+    "rmax_arcmin": "float32",
+    "diamMAX_arcmin": "float32",
+    "N": "int16",
+    "pmRA": "float32",
+    "e_pmRA": "float32",
+    "pmDE": "float32",
+    "e_pmDE": "float32",
+    "Vr": "float32",
+    "e_Vr": "float32",
+    "Nvr": "int16",
+    "Plx": "float32",
+    "e_Plx": "float32",
+    "sigPM": "float32",
+    "flagdispPM": "int8",
+    "age": "float32",
+    "e_age": "float32",
+    "dist_iso": "int32",
+    "e_dist_iso": "int32",
+    "FeH": "float32",
+    "e_FeH": "float32",
+    "Av": "float32",
+    "e_Av": "float32",
+    "AG": "float32",
+    "e_AG": "float32",
+    "dist_PLX": "int32",
+    "e_dist_PLX": "int32",
+    "Diam_pc": "int32",
+    "DiamMax_pc": "int32",
+    "delta_dist": "int32",
+    "likelihood": "float64",
+    "BIC": "float64",
+    "prior_FEH": "int8",
+    "prior_AV": "int8",
+    "REF": "int8",
+}
+
+#   Parsed catalogues kept for the lifetime of the process, keyed by absolute CSV path.
+#   Entries are validated against the file's (size, mtime) so an edited CSV is never served.
+_loaded: dict[str, tuple[tuple[int, int], pd.DataFrame]] = {}
+
+
+def snapshotPath(csvPath: str):
+    base, _ = os.path.splitext(csvPath)
+    return base + (".parquet" if SNAPSHOT_FORMAT == "parquet" else ".pkl")
+
+def metadataPath(csvPath: str):
+    return snapshotPath(csvPath) + ".json"
+
+def fileHash(path: str, blockSize: int = 1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blockSize), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fileSignature(path: str):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+#   A snapshot is fresh when the CSV has the same size and mtime it had when the snapshot was
+#   written. If only the mtime moved (e.g. the file was touched or checked out again) the content
+#   hash decides, and the stored mtime is refreshed so the next check is cheap again.
+def isSnapshotFresh(csvPath: str):
+    snapshot, metadata = snapshotPath(csvPath), metadataPath(csvPath)
+    if not (os.path.exists(snapshot) and os.path.exists(metadata)):
+        return False
+    try:
+        with open(metadata, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    if stored.get("format") != SNAPSHOT_FORMAT or stored.get("schema") != CATALOGUE_SCHEMA:
+        return False
+    size, mtime = fileSignature(csvPath)
+    if stored.get("size") != size:
+        return False
+    if stored.get("mtime_ns") == mtime:
+        return True
+    if stored.get("sha1") != fileHash(csvPath):
+        return False
+
+    stored["mtime_ns"] = mtime
+    writeMetadata(metadata, stored)
+    return True
+
+def writeMetadata(path: str, metadata: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp, path)
+
+def writeSnapshot(df: pd.DataFrame, csvPath: str):
+    snapshot = snapshotPath(csvPath)
+    tmp = snapshot + ".tmp"
+    try:
+        if SNAPSHOT_FORMAT == "parquet":
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, snapshot)
+
+        size, mtime = fileSignature(csvPath)
+        writeMetadata(metadataPath(csvPath), {
+            "format": SNAPSHOT_FORMAT,
+            "schema": CATALOGUE_SCHEMA,
+            "size": size,
+            "mtime_ns": mtime,
+            "sha1": fileHash(csvPath),
+            "rows": len(df),
+        })
+    except OSError as e:
+        #   A read-only checkout still works, it just parses the CSV every time.
+        print(f"Could not write catalogue snapshot: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def floatColumns():
+    return {col: dtype for col, dtype in CATALOGUE_SCHEMA.items() if dtype.startswith("float")}
+
+def applySchema(df: pd.DataFrame):
+    for col, dtype in CATALOGUE_SCHEMA.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype.startswith("float"):
+            df[col] = df[col].astype(dtype)
+            continue
+        if dtype == "category":
+            #   Cluster names are unique in the published catalogue, where a categorical only adds
+            #   a codes array on top of the same strings; it pays off once names repeat.
+            if df[col].nunique() <= len(df) // 2:
+                df[col] = df[col].astype(dtype)
+            continue
+
+        values = df[col]
+        if values.isna().any():
+            df[col] = values.astype(dtype.capitalize())
+            continue
+        limits = np.iinfo(dtype)
+        if limits.min <= values.min() and values.max() <= limits.max:
+            df[col] = values.astype(dtype)
+    return df
+
+#   Null handling that keeps every column numeric: +-inf becomes NaN in float columns and empty
+#   names become missing, instead of replacing values with None and turning columns into object.
+#   Conversion to None only happens row by row at the database boundary (see sqlRows).
+def cleanCatalogue(df: pd.DataFrame):
+    for col in df.select_dtypes(include="floating").columns:
+        values = df[col].to_numpy()
+        if np.isinf(values).any():
+            df[col] = df[col].mask(np.isinf(values))
+    if "name" in df.columns:
+        df["name"] = df["name"].replace("", None)
+    return df
+
+def sqlRows(df: pd.DataFrame):
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(None if pd.isna(value) else value.item() if hasattr(value, "item") else value for value in row)
+
+def readSnapshot(csvPath: str):
+    snapshot = snapshotPath(csvPath)
+    if SNAPSHOT_FORMAT == "parquet":
+        return pd.read_parquet(snapshot)
+    return pd.read_pickle(snapshot)
+
+#   Single entry point for every script that needs the Dias catalogue.
+#   The first call parses the CSV and writes a typed binary snapshot next to it, later calls
+#   (in this or any other process) read the snapshot instead. Each caller gets its own copy,
+#   since most scripts add or clean columns in place.
+#   The snapshot stores the compact schema; compact=False widens the float32 columns back to
+#   float64 through their shortest decimal repr (51.862 stays 51.862, not 51.86199951171875),
+#   for callers that hand values to JSON or MongoDB as doubles.
+def loadCatalogue(path: str = CATALOGUE_PATH, refresh: bool = False, compact: bool = True):
+    key = os.path.abspath(path)
+    signature = fileSignature(key)
+
+    cached = _loaded.get(key)
+    if cached and cached[0] == signature and not refresh:
+        df = cached[1]
+    else:
+        if not refresh and isSnapshotFresh(key):
+            df = readSnapshot(key)
+        else:
+            df = pd.read_csv(key, dtype=floatColumns())
+            df = applySchema(df)
+            writeSnapshot(df, key)
+        _loaded[key] = (signature, df)
+
+    return df.copy() if compact else widen(df)
+
+def widen(df: pd.DataFrame):
+    wide = df.copy()
+    for col in wide.select_dtypes(include="float32").columns:
+        wide[col] = widenValues(wide[col])
+    return wide
+
+def widenValues(values: pd.Series):
+    if values.dtype != np.float32:
+        return values
+    return pd.Series(values.to_numpy().astype(str).astype(np.float64), index=values.index, name=values.name)
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Bootstrap sample of the real catalogue with unique names, shaped exactly like pd.read_csv's output.
+def syntheticCatalogue(rows: int, path: str = CATALOGUE_PATH, seed: int = 0):
+    base = pd.read_csv(path)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    df["name"] = df["name"].astype(str) + "_" + pd.RangeIndex(rows).astype(str)
+    return df
+
+def memoryReport(before: pd.DataFrame, after: pd.DataFrame):
+    report = pd.DataFrame({
+        "before_dtype": before.dtypes.astype(str),
+        "after_dtype": after.dtypes.astype(str),
+        "before_bytes": before.memory_usage(deep=True, index=False),
+        "after_bytes": after.memory_usage(deep=True, index=False),
+    })
+    report.loc["TOTAL", ["before_bytes", "after_bytes"]] = report[["before_bytes", "after_bytes"]].sum()
+    report["saved"] = 1 - report["after_bytes"] / report["before_bytes"]
+    print(report.to_string())
+    return report
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    raw = syntheticCatalogue(rows)
+    memoryReport(raw, applySchema(cleanCatalogue(raw.copy())))
@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from common.catalogue import applySchema, syntheticCatalogue, widen, widenValues
+from common.querycache import invalidateCollection
+from common.views import MODIFIED_FIELD, stampDocument, writeStamp
+
+#   MongoDB documents built straight from the column arrays of a catalogue frame.
+#   A layout lists the top-level fields and the nested objects with their fields, so the
+#   default one gives {"name", "position": {RA_ICRS, ...}, "features": {r50, ...}}, the shape the
+#   tp3/tp4 loaders used to get from a row-wise apply, a JSON file and json.load.
+#   Each column is converted once per batch to a list of Python values (NaN and +-inf become
+#   None, as to_json + json.load made them null, float32 goes through its shortest repr), and the
+#   documents are zipped together from those lists: no Series per row, no temp file, and at
+#   most one batch of documents alive at a time.
+
+DEFAULT_BATCH_SIZE = 10_000
+
+#   Bookkeeping the write helpers add next to the catalogue fields: the content hash of
+#   common.reload and the modification stamp of common.views. Reads shown to the user leave them
+#   out through publicProjection.
+HASH_FIELD = "_hash"
+BOOKKEEPING_FIELDS = (HASH_FIELD, MODIFIED_FIELD)
+
+CATALOGUE_LAYOUT = {
+    None: ["name"],
+    "position": ["RA_ICRS", "DE_ICRS", "Plx", "dist_PLX"],
+    "features": ["r50", "Vr", "age", "FeH", "Diam_pc"],
+}
+
+
+def pythonValues(values: pd.Series):
+    if pd.api.types.is_float_dtype(values.dtype):
+        floats = widenValues(values).to_numpy(dtype=np.float64)
+        converted = floats.astype(object)
+        converted[~np.isfinite(floats)] = None
+        return converted.tolist()
+    if pd.api.types.is_integer_dtype(values.dtype) and not values.hasnans:
+        return values.to_numpy().tolist()
+    converted = values.to_numpy(dtype=object, copy=True)
+    converted[pd.isna(converted)] = None
+    return converted.tolist()
+
+def buildDocuments(df: pd.DataFrame, layout: dict = CATALOGUE_LAYOUT):
+    keys = []
+    columns = []
+    for key, fields in layout.items():
+        values = [pythonValues(df[field]) for field in fields]
+        if key is None:
+            keys += fields
+            columns += values
+        else:
+            keys.append(key)
+            columns.append([dict(zip(fields, row)) for row in zip(*values)])
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+#   find() projection without the bookkeeping fields. An inclusion projection already leaves them
+#   out; an exclusion one (or none) gets them added.
+def publicProjection(projection: dict | None = None):
+    projection = dict(projection or {})
+    if any(value for field, value in projection.items() if field != "_id"):
+        return projection
+    return {**projection, **{field: 0 for field in BOOKKEEPING_FIELDS}}
+
+def documentBatches(df: pd.DataFrame, layout: dict = CATALOGUE_LAYOUT, batchSize: int = DEFAULT_BATCH_SIZE):
+    for start in range(0, len(df), batchSize):
+        yield buildDocuments(df.iloc[start:start + batchSize], layout)
+
+#   Sequential counterpart of common.ingest.ingestMongo, which also takes a frame. In a collection
+#   with views, documents are stamped with the modification time the views of common.views
+#   refresh from.
+def insertFrame(col, df: pd.DataFrame, layout: dict = CATALOGUE_LAYOUT, batchSize: int = DEFAULT_BATCH_SIZE):
+    inserted = 0
+    try:
+        for documents in documentBatches(df, layout, batchSize):
+            stamp = writeStamp(col)
+            inserted += len(col.insert_many([stampDocument(document, stamp) for document in documents], ordered=False).inserted_ids)
+    finally:
+        invalidateCollection(col)
+    return inserted
+
+#-------------------------------------------------------------------------------------------------#
+
+def jsonDocuments(df: pd.DataFrame, path: str):
+    df = df.copy()
+    for key, fields in CATALOGUE_LAYOUT.items():
+        if key is not None:
+            df[key] = df[fields].apply(lambda s: s.to_dict(), axis=1)
+    df[CATALOGUE_LAYOUT[None] + [key for key in CATALOGUE_LAYOUT if key is not None]].to_json(
+        path, orient="records", double_precision=10, force_ascii=True, indent=2)
+    with open(path, "r") as f:
+        return json.load(f)
+
+#   Seconds and peak traced memory to get the documents of a synthetic catalogue, the old way
+#   (apply + JSON file) against buildDocuments and a pass over documentBatches.
+def benchmark(rows: int, batchSize: int = DEFAULT_BATCH_SIZE):
+    df = widen(applySchema(syntheticCatalogue(rows)))
+    handle, path = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+
+    def run(build):
+        start = time.perf_counter()
+        count = build()
+        elapsed = time.perf_counter() - start
+        #   Memory is traced on a second run, tracing slows the Python loops down several times.
+        tracemalloc.start()
+        build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {"documents": count, "seconds": elapsed, "docs/s": count / elapsed, "peak MB": peak / 2 ** 20}
+
+    try:
+        results = {
+            "apply + json": run(lambda: len(jsonDocuments(df, path))),
+            "buildDocuments": run(lambda: len(buildDocuments(df))),
+            "documentBatches": run(lambda: sum(len(batch) for batch in documentBatches(df, batchSize=batchSize))),
+        }
+    finally:
+        os.remove(path)
+    return pd.DataFrame(results).T
+
+if __name__ == "__main__":
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000
+    print(benchmark(rows).to_string())
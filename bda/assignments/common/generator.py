@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from common.catalogue import CATALOGUE_PATH, applySchema, cleanCatalogue
+from common.documents import insertFrame
+from common.ingest import ingestSQL
+
+#   Synthetic Dias catalogues of any size, fitted to the real one, for scale-out experiments.
+#   syntheticCatalogue (common.catalogue) resamples whole rows, so a large frame is the same
+#   1758 rows over and over and every index sees long runs of duplicates. Here each column is
+#   mapped to normal scores through its ranks (a Gaussian copula), and a synthetic row is a real
+#   row jittered by `bandwidth` standard deviations in that space, then mapped back through the
+#   column's empirical quantiles. That keeps:
+#   - the marginals (values stay inside the observed range, integers stay integers and floats
+#     keep the catalogue's decimals)
+#   - the joint structure, rank correlations included: RA/DE sky density along the plane,
+#     Plx against dist_PLX, age against FeH, ...
+#   - the null and +-inf patterns, taken as a whole from the drawn row (Vr and e_Vr go missing
+#     together)
+#   Names are the drawn row's prefix and the global row number (NGC_1234567), so they are unique
+#   and prefix queries keep their selectivity.
+#
+#   Rows are generated in chunks of `chunkRows`; chunk k always uses the random stream
+#   (seed, k), so the output only depends on seed, rows and chunkRows, not on the worker count.
+#   Chunks are produced in worker processes and written as they come: one CSV, a directory of
+#   Parquet parts (each written by its worker), a MySQL table (common.ingest) or a MongoDB
+#   collection (common.documents). A generated CSV loads with loadCatalogue(path) like the real one.
+
+DEFAULT_CHUNK_ROWS = 250_000
+DEFAULT_BANDWIDTH = 0.2
+DEFAULT_SEED = 0
+
+_model: dict | None = None
+
+
+def columnDecimals(values: np.ndarray, maxDecimals: int = 6):
+    for decimals in range(maxDecimals + 1):
+        if np.allclose(values, np.round(values, decimals), rtol=0, atol=1e-9):
+            return decimals
+    return maxDecimals
+
+def normalScores(values: pd.Series):
+    normal = NormalDist()
+    finite = np.isfinite(values.to_numpy(dtype=np.float64))
+    ranks = values[finite].rank(method="average").to_numpy()
+    scores = np.full(len(values), np.nan)
+    scores[finite] = [normal.inv_cdf((rank - 0.5) / finite.sum()) for rank in ranks]
+    return scores
+
+def fitCatalogue(path: str = CATALOGUE_PATH):
+    base = pd.read_csv(path)
+    columns = [column for column in base.columns if column != "name"]
+    raw = base[columns].to_numpy(dtype=np.float64)
+    scores = np.column_stack([normalScores(base[column]) for column in columns])
+
+    grids = []
+    decimals = []
+    for i in range(len(columns)):
+        finite = np.isfinite(raw[:, i])
+        order = np.argsort(scores[finite, i], kind="stable")
+        grids.append((scores[finite, i][order], raw[finite, i][order]))
+        decimals.append(columnDecimals(raw[finite, i]))
+    return {
+        "columns": columns,
+        "integer": [pd.api.types.is_integer_dtype(base[column].dtype) for column in columns],
+        "decimals": decimals,
+        "prefixes": base["name"].astype(str).str.split("_").str[0].to_numpy(dtype=object),
+        "raw": raw,
+        "scores": scores,
+        "grids": grids,
+    }
+
+#-------------------------------------------------------------------------------------------------#
+
+def chunkCount(rows: int, chunkRows: int):
+    return (rows + chunkRows - 1) // chunkRows
+
+def generateChunk(model: dict, chunk: int, rows: int, chunkRows: int = DEFAULT_CHUNK_ROWS,
+                  seed: int = DEFAULT_SEED, bandwidth: float = DEFAULT_BANDWIDTH):
+    start = chunk * chunkRows
+    size = min(chunkRows, rows - start)
+    rng = np.random.default_rng([seed, chunk])
+    drawn = rng.integers(0, len(model["raw"]), size)
+
+    data = {"name": model["prefixes"][drawn] + "_" + np.arange(start, start + size).astype(str).astype(object)}
+    for i, column in enumerate(model["columns"]):
+        scores = model["scores"][drawn, i] + bandwidth * rng.standard_normal(size)
+        grid, values = model["grids"][i]
+        generated = np.interp(scores, grid, values)
+        #   NaN scores are the drawn rows' missing and infinite values, copied over as they are.
+        special = np.isnan(scores)
+        generated[special] = model["raw"][drawn[special], i]
+        generated = np.round(generated, 0 if model["integer"][i] else model["decimals"][i])
+        data[column] = generated.astype(np.int64) if model["integer"][i] and not special.any() else generated
+    return pd.DataFrame(data)
+
+def initWorker(model: dict):
+    global _model
+    _model = model
+
+def workerChunk(chunk: int, rows: int, chunkRows: int, seed: int, bandwidth: float):
+    return generateChunk(_model, chunk, rows, chunkRows, seed, bandwidth)
+
+def workerParquet(directory: str, chunk: int, rows: int, chunkRows: int, seed: int, bandwidth: float):
+    df = generateChunk(_model, chunk, rows, chunkRows, seed, bandwidth)
+    df.to_parquet(os.path.join(directory, f"part-{chunk:05d}.parquet"), index=False)
+    return len(df)
+
+#   Chunk frames in order. At most 2 * workers chunks are in flight, so memory stays bounded by
+#   the chunk size whatever the number of rows.
+def catalogueChunks(rows: int, chunkRows: int = DEFAULT_CHUNK_ROWS, seed: int = DEFAULT_SEED, workers: int | None = None,
+                    bandwidth: float = DEFAULT_BANDWIDTH, model: dict | None = None):
+    model = model or fitCatalogue()
+    chunks = chunkCount(rows, chunkRows)
+    workers = min(workers or os.cpu_count() or 1, chunks)
+    if workers <= 1:
+        for chunk in range(chunks):
+            yield generateChunk(model, chunk, rows, chunkRows, seed, bandwidth)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(model,)) as executor:
+        pending = []
+        for chunk in range(chunks):
+            pending.append(executor.submit(workerChunk, chunk, rows, chunkRows, seed, bandwidth))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+def generateCatalogue(rows: int, seed: int = DEFAULT_SEED, bandwidth: float = DEFAULT_BANDWIDTH, model: dict | None = None):
+    return pd.concat(catalogueChunks(rows, seed=seed, workers=1, bandwidth=bandwidth, model=model), ignore_index=True)
+
+#-------------------------------------------------------------------------------------------------#
+
+def writeCSV(path: str, rows: int, chunkRows: int = DEFAULT_CHUNK_ROWS, seed: int = DEFAULT_SEED, workers: int | None = None,
+             bandwidth: float = DEFAULT_BANDWIDTH):
+    written = 0
+    with open(path, "w", newline="") as f:
+        for df in catalogueChunks(rows, chunkRows, seed, workers, bandwidth):
+            df.to_csv(f, index=False, header=written == 0)
+            written += len(df)
+    return written
+
+#   One part file per chunk, written by the worker that generated it.
+def writeParquet(directory: str, rows: int, chunkRows: int = DEFAULT_CHUNK_ROWS, seed: int = DEFAULT_SEED, workers: int | None = None,
+                 bandwidth: float = DEFAULT_BANDWIDTH):
+    os.makedirs(directory, exist_ok=True)
+    model = fitCatalogue()
+    chunks = chunkCount(rows, chunkRows)
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, chunks), initializer=initWorker, initargs=(model,)) as executor:
+        futures = [executor.submit(workerParquet, directory, chunk, rows, chunkRows, seed, bandwidth) for chunk in range(chunks)]
+        return sum(future.result() for future in futures)
+
+#   The first chunk replaces the table, the others are appended (see common.ingest.ingestSQL).
+#   Chunks keep their float64 values, so the float columns are DOUBLE like the catalogue tables.
+#   The first chunk only holds the shortest row numbers, so name is sized for the last row.
+def loadSQL(engine, table: str, rows: int, chunkRows: int = DEFAULT_CHUNK_ROWS, seed: int = DEFAULT_SEED, workers: int | None = None,
+            overrides: dict | None = None):
+    model = fitCatalogue()
+    nameLength = max(len(prefix) for prefix in model["prefixes"]) + 1 + len(str(max(rows - 1, 0)))
+    overrides = {"name": f"VARCHAR({nameLength})", **(overrides or {})}
+    loaded = 0
+    for df in catalogueChunks(rows, chunkRows, seed, workers, model=model):
+        ingestSQL(engine, cleanCatalogue(df), table, replace=loaded == 0, overrides=overrides)
+        loaded += len(df)
+    return loaded
+
+def loadMongo(col, rows: int, chunkRows: int = DEFAULT_CHUNK_ROWS, seed: int = DEFAULT_SEED, workers: int | None = None):
+    loaded = 0
+    for df in catalogueChunks(rows, chunkRows, seed, workers):
+        loaded += insertFrame(col, cleanCatalogue(df))
+    return loaded
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Per-column null rate and quantiles of the real catalogue against a generated one, and the
+#   largest gap between their Spearman correlation matrices.
+def compareCatalogue(real: pd.DataFrame, synthetic: pd.DataFrame, quantiles: list[float] = [0.05, 0.5, 0.95]):
+    columns = [column for column in real.columns if column != "name"]
+    report = {}
+    for column in columns:
+        a = real[column].replace([np.inf, -np.inf], np.nan)
+        b = synthetic[column].replace([np.inf, -np.inf], np.nan)
+        report[column] = {"null_real": a.isna().mean(), "null_synthetic": b.isna().mean()}
+        for q in quantiles:
+            report[column][f"q{q:g}_real"] = a.quantile(q)
+            report[column][f"q{q:g}_synthetic"] = b.quantile(q)
+    gap = (real[columns].corr("spearman") - synthetic[columns].corr("spearman")).abs().max().max()
+    return pd.DataFrame(report).T, gap
+
+#   Rows/s of the generator on 1 worker and on all of them, and how close the result is to the
+#   real catalogue.
+def benchmark(rows: int = 1_000_000, chunkRows: int = DEFAULT_CHUNK_ROWS):
+    model = fitCatalogue()
+    for workers in dict.fromkeys([1, os.cpu_count() or 1]):
+        start = time.perf_counter()
+        generated = sum(len(df) for df in catalogueChunks(rows, chunkRows, workers=workers, model=model))
+        elapsed = time.perf_counter() - start
+        print(f"{workers} workers: {generated} rows in {elapsed:.2f}s ({generated / elapsed:,.0f} rows/s)")
+
+    synthetic = generateCatalogue(min(rows, 200_000), model=model)
+    print(f"unique names: {synthetic['name'].is_unique}")
+    report, gap = compareCatalogue(pd.read_csv(CATALOGUE_PATH), synthetic)
+    print(report.to_string(float_format=lambda value: f"{value:.3f}"))
+    print(f"largest Spearman correlation gap: {gap:.3f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        benchmark(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000)
+    else:
+        rows, path = int(float(sys.argv[1])), sys.argv[2]
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        written = writeCSV(path, rows, workers=workers) if path.endswith(".csv") else writeParquet(path, rows, workers=workers)
+        print(f"Wrote {written} rows to {path}")
@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+#   Partitioned group-by aggregation.
+#   The group keys are factorized once into integer codes and, together with the value column,
+#   copied into shared memory. Each worker process attaches to both buffers, aggregates its own
+#   row shard into per-group partials (count, sum, M2, min, max) and returns only those, so what
+#   crosses process boundaries is O(groups) per shard. Partials are merged with the parallel
+#   variance formula, which gives the same mean/std as a single pass without the precision loss
+#   of a raw sum of squares.
+#
+#   Output follows df.groupby(by)[column].agg(aggs): sorted group keys as the index, missing keys
+#   and missing values ignored, and every result column in the dtype pandas would return.
+
+AGGREGATES = ("mean", "std", "min", "max", "count", "sum")
+
+#   Below this many rows the process pool costs more than it saves and one shard runs in-process.
+PARALLEL_THRESHOLD = 1_000_000
+
+
+def attach(name: str):
+    #   Workers only borrow the segment, the parent owns and unlinks it. Pool workers share the
+    #   parent's resource tracker, so before 3.13 the duplicate registration is harmless.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def shardPartials(codes: np.ndarray, values: np.ndarray, groups: int):
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+
+    count = np.bincount(codes, minlength=groups)
+    total = np.bincount(codes, weights=values, minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=groups)
+
+    minimum = np.full(groups, np.inf)
+    maximum = np.full(groups, -np.inf)
+    np.minimum.at(minimum, codes, values)
+    np.maximum.at(maximum, codes, values)
+    return np.stack([count, total, m2, minimum, maximum])
+
+def sharedShardPartials(codesName: str, valuesName: str, rows: int, codesDtype: str, start: int, stop: int, groups: int):
+    codesShm, valuesShm = attach(codesName), attach(valuesName)
+    try:
+        codes = np.ndarray(rows, dtype=codesDtype, buffer=codesShm.buf)
+        values = np.ndarray(rows, dtype=np.float64, buffer=valuesShm.buf)
+        return shardPartials(codes[start:stop], values[start:stop], groups)
+    finally:
+        del codes, values
+        codesShm.close()
+        valuesShm.close()
+
+def toShared(array: np.ndarray):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm
+
+def mergePartials(partials: list[np.ndarray]):
+    stacked = np.stack(partials)
+    count = stacked[:, 0].sum(axis=0)
+    total = stacked[:, 1].sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        shardMeans = stacked[:, 1] / stacked[:, 0]
+    spread = np.where(stacked[:, 0] > 0, stacked[:, 0] * (shardMeans - mean) ** 2, 0)
+    m2 = stacked[:, 2].sum(axis=0) + spread.sum(axis=0)
+    return {
+        "count": count,
+        "sum": total,
+        "mean": mean,
+        "m2": m2,
+        "min": stacked[:, 3].min(axis=0),
+        "max": stacked[:, 4].max(axis=0),
+    }
+
+def groupAggregate(df: pd.DataFrame, by: str, column: str, aggs: list[str] = ["mean"], workers: int | None = None, shards: int | None = None):
+    unknown = set(aggs) - set(AGGREGATES)
+    if unknown:
+        raise ValueError(f"Unsupported aggregates: {sorted(unknown)}")
+
+    codes, uniques = pd.factorize(df[by], sort=True)
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    groups, rows = len(uniques), len(values)
+
+    workers = workers or os.cpu_count() or 1
+    if rows < PARALLEL_THRESHOLD or workers == 1:
+        partials = [shardPartials(codes, values, groups)]
+    else:
+        shards = shards or workers
+        bounds = np.linspace(0, rows, shards + 1, dtype=np.int64)
+        codesShm, valuesShm = toShared(codes), toShared(values)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(sharedShardPartials, codesShm.name, valuesShm.name, rows, codes.dtype.str, int(start), int(stop), groups)
+                           for start, stop in zip(bounds[:-1], bounds[1:])]
+                partials = [future.result() for future in futures]
+        finally:
+            for shm in (codesShm, valuesShm):
+                shm.close()
+                shm.unlink()
+
+    merged = mergePartials(partials)
+    count = merged["count"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(merged["m2"] / (count - 1))
+    empty = count == 0
+    columns = {
+        "mean": merged["mean"],
+        "std": np.where(count > 1, std, np.nan),
+        "min": np.where(empty, np.nan, merged["min"]),
+        "max": np.where(empty, np.nan, merged["max"]),
+        "count": count.astype(np.int64),
+        "sum": merged["sum"],
+    }
+
+    #   Same result dtypes as pandas, read off the same aggregation over no rows: float32 stays
+    #   float32, integer sum/min/max keep the column's integer dtype (int32 sums are int32).
+    dtypes = df[[by, column]].head(0).groupby(by)[column].agg(aggs).dtypes
+    result = pd.DataFrame({agg: columns[agg] for agg in aggs}, index=pd.Index(uniques, name=by))
+    for agg in aggs:
+        values = result[agg]
+        if isinstance(dtypes[agg], np.dtype) and dtypes[agg].kind in "iu":
+            #   Through int64, so a sum overflowing a narrow dtype wraps as it does in pandas.
+            values = values.astype(np.int64)
+        result[agg] = values.astype(dtypes[agg])
+    return result
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Per-group (count, mean, M2) kept as a DataFrame, the same sufficient statistics as the shard
+#   partials. Moments of new rows are merged in and those of deleted rows taken back out, so a
+#   summary can follow a changing table without rescanning it.
+def groupMoments(df: pd.DataFrame, by: str, column: str):
+    codes, uniques = pd.factorize(df[by], sort=True)
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    count, total, m2 = shardPartials(codes, values, len(uniques))[:3]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+    moments = pd.DataFrame({"count": count.astype(np.int64), "mean": mean, "m2": m2}, index=pd.Index(np.asarray(uniques), name=by))
+    return moments[moments["count"] > 0]
+
+def alignMoments(a: pd.DataFrame, b: pd.DataFrame):
+    index = a.index.union(b.index)
+    fill = {"count": 0, "mean": 0.0, "m2": 0.0}
+    return a.reindex(index).fillna(fill), b.reindex(index).fillna(fill)
+
+def mergeGroupMoments(a: pd.DataFrame, b: pd.DataFrame):
+    a, b = alignMoments(a, b)
+    count = a["count"] + b["count"]
+    delta = b["mean"] - a["mean"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = a["mean"] + delta * b["count"] / count
+        m2 = a["m2"] + b["m2"] + delta ** 2 * a["count"] * b["count"] / count
+    return pd.DataFrame({"count": count.astype(np.int64), "mean": mean, "m2": m2})
+
+#   Inverse of mergeGroupMoments: the moments of a once b's rows are taken out of it.
+def removeGroupMoments(a: pd.DataFrame, b: pd.DataFrame):
+    a, b = alignMoments(a, b)
+    count = a["count"] - b["count"]
+    if (count < 0).any():
+        raise ValueError(f"Removing more rows than the summary holds for: {list(count.index[count < 0])}")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (a["count"] * a["mean"] - b["count"] * b["mean"]) / count
+        m2 = a["m2"] - b["m2"] - (b["mean"] - mean) ** 2 * count * b["count"] / a["count"]
+    moments = pd.DataFrame({"count": count.astype(np.int64), "mean": mean, "m2": m2.clip(lower=0)})
+    return moments[moments["count"] > 0]
+
+#-------------------------------------------------------------------------------------------------#
+
+def benchmark(rows: int, workerCounts: list[int], seed: int = 0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "flagdispPM": rng.integers(0, 4, rows, dtype=np.int8),
+        "sigPM": rng.gamma(1.5, 0.3, rows).astype(np.float32),
+    })
+    aggs = ["mean", "std", "min", "max", "count", "sum"]
+
+    start = time.perf_counter()
+    expected = df.groupby("flagdispPM")["sigPM"].agg(aggs)
+    print(f"pandas groupby: {time.perf_counter() - start:.3f}s")
+
+    for workers in workerCounts:
+        start = time.perf_counter()
+        result = groupAggregate(df, "flagdispPM", "sigPM", aggs, workers=workers)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-5)
+        print(f"groupAggregate workers={workers}: {elapsed:.3f}s")
+
+    #   Integer columns keep pandas' integer result dtypes.
+    df["nobs"] = rng.integers(0, 1000, rows, dtype=np.int32)
+    pd.testing.assert_frame_equal(groupAggregate(df, "flagdispPM", "nobs", aggs), df.groupby("flagdispPM")["nobs"].agg(aggs))
+
+if __name__ == "__main__":
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 50_000_000
+    cores = os.cpu_count() or 1
+    benchmark(rows, sorted({1, 2, 4, cores}))
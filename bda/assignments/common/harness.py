@@ -0,0 +1,147 @@
+import gc
+import json
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.catalogue import applySchema, cleanCatalogue, syntheticCatalogue
+from common.results import countRows, streamQuery
+
+#   Repeatable timings of a named query suite across MySQL, MongoDB and pandas.
+#   A suite is a list of (case, {backend: run}) pairs, where run is a zero-argument callable built
+#   by sqlCase/mongoCase/mongoPipelineCase/pandasCase. Every run is timed with perf_counter_ns
+#   up to the last row: cursors are drained, SQL results fetched in full (common.results), so lazy
+#   find()/execute() calls cannot pass for fast queries. Each run starts with `warmup` untimed
+#   calls (connection setup, plan and page caches), then `repeat` timed ones with the garbage
+#   collector off, and reports min/p50/p95/p99/mean/stddev in ms, rows returned and rows/s at
+#   the median. A case whose row count changes between calls is an error, not a timing.
+#   The builders call the drivers directly, so nothing goes through common.querycache.
+
+DEFAULT_WARMUP = 3
+DEFAULT_REPEAT = 30
+PERCENTILES = (50, 95, 99)
+
+
+#   Whatever a run returned, fully fetched: None, frames, sequences and ints (an already counted
+#   result) as they are, DB-API cursors and SQLAlchemy results through fetchall, anything else iterable
+#   (a pymongo cursor) drained into a list.
+def materialize(result):
+    if result is None or isinstance(result, (int, np.integer, pd.DataFrame, pd.Series, np.ndarray, list, tuple)):
+        return result
+    if hasattr(result, "fetchall"):
+        return result.fetchall()
+    return list(result)
+
+def rowCount(result):
+    result = materialize(result)
+    return int(result) if isinstance(result, (int, np.integer)) else len(result)
+
+#   One timed call, up to the last row, for the exercises' single-shot prints.
+def measure(run):
+    start = time.perf_counter_ns()
+    result = materialize(run())
+    return result, (time.perf_counter_ns() - start) / 1e9
+
+#-------------------------------------------------------------------------------------------------#
+
+def sqlCase(con, sql: str, params: tuple | dict | None = None):
+    return lambda: countRows(streamQuery(con, sql, params))
+
+def mongoCase(col, filter: dict, projection: dict | None = None, sort: list[tuple[str, int]] | None = None, limit: int = 0):
+    return lambda: col.find(filter, projection, sort=sort, limit=limit)
+
+def mongoPipelineCase(col, pipeline: list[dict]):
+    return lambda: col.aggregate(pipeline)
+
+#   select is a DataFrame.query string or a function of the frame.
+def pandasCase(df: pd.DataFrame, select):
+    if isinstance(select, str):
+        return lambda: df.query(select)
+    return lambda: select(df)
+
+#-------------------------------------------------------------------------------------------------#
+
+def timeRuns(run, warmup: int, repeat: int):
+    rows = {rowCount(run()) for _ in range(warmup)}
+    samples = np.empty(repeat, dtype=np.int64)
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter_ns()
+            rows.add(rowCount(run()))
+            samples[i] = time.perf_counter_ns() - start
+    finally:
+        if enabled:
+            gc.enable()
+    if len(rows) != 1:
+        raise RuntimeError(f"Row count changed between runs: {sorted(rows)}")
+    return rows.pop(), samples
+
+def summarize(samples: np.ndarray, rows: int):
+    ms = samples / 1e6
+    stats = {"runs": len(samples), "rows": rows, "min_ms": ms.min()}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        stats[f"p{p}_ms"] = value
+    stats["mean_ms"] = ms.mean()
+    stats["stddev_ms"] = ms.std(ddof=1) if len(ms) > 1 else 0.0
+    stats["rows_per_s"] = rows / (stats["p50_ms"] / 1e3) if stats["p50_ms"] else 0.0
+    return stats
+
+def runBenchmark(suite: list[tuple[str, dict]], warmup: int = DEFAULT_WARMUP, repeat: int = DEFAULT_REPEAT):
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    records = []
+    for case, runs in suite:
+        for backend, run in runs.items():
+            rows, samples = timeRuns(run, warmup, repeat)
+            records.append({"case": case, "backend": backend, **summarize(samples, rows)})
+    return pd.DataFrame(records)
+
+#   .json (a list of records) or .csv, by the extension of path.
+def writeReport(report: pd.DataFrame, path: str):
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(report.to_dict(orient="records"), f, indent=2)
+    elif path.endswith(".csv"):
+        report.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unknown report format {path}, expected .json or .csv")
+
+def printReport(report: pd.DataFrame):
+    columns = ["case", "backend", "rows", "min_ms", "p50_ms", "p95_ms", "p99_ms", "stddev_ms", "rows_per_s"]
+    print(report[columns].to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+#-------------------------------------------------------------------------------------------------#
+
+#   A few catalogue queries in SQLite against the same selections in pandas, on a synthetic
+#   catalogue of `rows` rows; the report goes to `path` if given.
+def benchmark(rows: int = 100_000, path: str | None = None, warmup: int = DEFAULT_WARMUP, repeat: int = DEFAULT_REPEAT):
+    df = cleanCatalogue(applySchema(syntheticCatalogue(rows)))
+    con = sqlite3.connect(":memory:")
+    df.to_sql("clusters", con, index=False)
+    suite = [
+        ("age > 8", {
+            "sqlite": sqlCase(con, "SELECT * FROM clusters WHERE age > ?", (8,)),
+            "pandas": pandasCase(df, "age > 8"),
+        }),
+        ("FeH < 0 and Diam_pc > 10, by RA", {
+            "sqlite": sqlCase(con, "SELECT * FROM clusters WHERE FeH < 0 AND Diam_pc > 10 ORDER BY RA_ICRS"),
+            "pandas": pandasCase(df, lambda df: df[(df["FeH"] < 0) & (df["Diam_pc"] > 10)].sort_values("RA_ICRS")),
+        }),
+    ]
+    try:
+        report = runBenchmark(suite, warmup, repeat)
+    finally:
+        con.close()
+    if path:
+        writeReport(report, path)
+    return report
+
+if __name__ == "__main__":
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000
+    printReport(benchmark(rows, sys.argv[2] if len(sys.argv) > 2 else None))
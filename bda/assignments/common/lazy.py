@@ -0,0 +1,205 @@
+import ast
+
+import pandas as pd
+
+from common.catalogue import (SNAPSHOT_FORMAT, applySchema, floatColumns,
+                              isSnapshotFresh, snapshotPath)
+from common.topk import topK
+
+#   Lazy query plan over a CSV file (or an in-memory DataFrame).
+#   select/filter/sort/head only record a step, collect() optimizes the whole plan first:
+#   - filters move in front of selects and sorts, heads in front of selects
+#   - sort followed by head becomes a single top-k step
+#   - only the columns used by some step or by the final projection are read (usecols)
+#   - a leading head reads just that many rows, and with chunkSize set the filters and
+#     selects run per chunk, so a head/top-k can stop or keep a bounded buffer while reading.
+#   The plan is checked in its original order first, so a step using a column that an earlier
+#   select dropped fails as it would eagerly, instead of being moved in front of that select.
+#   CSV reads get the catalogue schema (applySchema), the same dtypes as the snapshot.
+#
+#   Steps are plain tuples:
+#       ("select", columns)  ("filter", expr, columns)  ("sort", by, ascending)
+#       ("head", n)          ("topk", by, ascending, n)
+
+
+def exprColumns(expr: str):
+    #   Names used by a DataFrame.query expression, None when it cannot be parsed (e.g. @vars),
+    #   in which case every column is kept.
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError:
+        return None
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+class LazyFrame:
+    def __init__(self, source: str | pd.DataFrame, steps: list[tuple] | None = None):
+        self.source = source
+        self.steps = steps or []
+
+    def _then(self, step: tuple):
+        return LazyFrame(self.source, self.steps + [step])
+
+    def select(self, columns: list[str]):
+        return self._then(("select", list(columns)))
+
+    def filter(self, expr: str):
+        return self._then(("filter", expr, exprColumns(expr)))
+
+    def sort(self, by: str | list[str], ascending: bool | list[bool] = True):
+        return self._then(("sort", [by] if isinstance(by, str) else list(by), ascending))
+
+    def head(self, n: int = 5):
+        return self._then(("head", n))
+
+    def header(self):
+        if isinstance(self.source, pd.DataFrame):
+            return list(self.source.columns)
+        return list(pd.read_csv(self.source, nrows=0).columns)
+
+    def columns(self):
+        columns = self.header()
+        for step in self.steps:
+            if step[0] == "select":
+                columns = step[1]
+        return columns
+
+    #---------------------------------------------------------------------------------------------#
+
+    #   Walks the steps in the order they were written, tracking the columns each one sees.
+    #   Filter names that are not catalogue columns (functions, constants) are left to eval.
+    def validate(self):
+        header = self.header()
+        available = header
+        for step in self.steps:
+            if step[0] == "filter":
+                used = set() if step[2] is None else step[2] & set(header)
+            elif step[0] in ("select", "sort"):
+                used = set(step[1])
+            else:
+                continue
+            missing = sorted(used - set(available))
+            if missing:
+                raise KeyError(f"{step[0]} uses {missing}, not among the columns at that step: {available}")
+            if step[0] == "select":
+                available = step[1]
+
+    def optimize(self):
+        self.validate()
+        steps = list(self.steps)
+
+        moved = True
+        while moved:
+            moved = False
+            for i in range(1, len(steps)):
+                previous, step = steps[i - 1][0], steps[i][0]
+                if (step == "filter" and previous in ("select", "sort")) or (step == "head" and previous == "select"):
+                    steps[i - 1], steps[i] = steps[i], steps[i - 1]
+                    moved = True
+
+        fused = []
+        for step in steps:
+            last = fused[-1] if fused else None
+            if step[0] == "head" and last and last[0] == "sort":
+                fused[-1] = ("topk", last[1], last[2], step[1])
+            elif step[0] == "head" and last and last[0] in ("head", "topk"):
+                fused[-1] = last[:-1] + (min(last[-1], step[1]),)
+            elif step[0] == "select" and last and last[0] == "select":
+                fused[-1] = step
+            else:
+                fused.append(step)
+
+        #   Walk the plan backwards collecting the columns each step needs, None meaning all.
+        #   Earlier selects are narrowed to what the steps after them still use.
+        needed = None
+        pruned = []
+        for step in reversed(fused):
+            if step[0] == "select":
+                if needed is not None:
+                    step = ("select", [c for c in step[1] if c in needed])
+                needed = set(step[1])
+            elif needed is not None and step[0] == "filter":
+                needed = None if step[2] is None else needed | step[2]
+            elif needed is not None and step[0] in ("sort", "topk"):
+                needed = needed | set(step[1])
+            pruned.append(step)
+
+        header = self.header()
+        usecols = None if needed is None else [c for c in header if c in needed] or header[:1]
+        return usecols, pruned[::-1]
+
+    def explain(self):
+        usecols, steps = self.optimize()
+        lines = [f"scan {self.source if isinstance(self.source, str) else 'DataFrame'} columns={usecols or 'all'}"]
+        lines += ["  " + " ".join(str(part) for part in step) for step in steps]
+        return "\n".join(lines)
+
+    #---------------------------------------------------------------------------------------------#
+
+    def read(self, usecols: list[str] | None, nrows: int | None = None):
+        if isinstance(self.source, pd.DataFrame):
+            df = self.source if usecols is None else self.source[usecols]
+            return df if nrows is None else df.head(nrows)
+        if nrows is None and SNAPSHOT_FORMAT == "parquet" and isSnapshotFresh(self.source):
+            return pd.read_parquet(snapshotPath(self.source), columns=usecols)
+        return applySchema(pd.read_csv(self.source, usecols=usecols, nrows=nrows, dtype=floatColumns()))
+
+    def readChunks(self, usecols: list[str] | None, chunkSize: int):
+        if isinstance(self.source, pd.DataFrame):
+            for start in range(0, len(self.source), chunkSize):
+                yield self.read(usecols).iloc[start:start + chunkSize]
+            return
+        for chunk in pd.read_csv(self.source, usecols=usecols, chunksize=chunkSize, dtype=floatColumns()):
+            yield applySchema(chunk)
+
+    def collect(self, chunkSize: int | None = None):
+        usecols, steps = self.optimize()
+
+        if chunkSize is None:
+            if steps and steps[0][0] == "head":
+                return applySteps(self.read(usecols, steps[0][1]), steps[1:])
+            return applySteps(self.read(usecols), steps)
+
+        prefix = 0
+        while prefix < len(steps) and steps[prefix][0] in ("filter", "select"):
+            prefix += 1
+        limit = steps[prefix] if prefix < len(steps) and steps[prefix][0] in ("head", "topk") else None
+
+        parts, rows = [], 0
+        for chunk in self.readChunks(usecols, chunkSize):
+            chunk = applySteps(chunk, steps[:prefix])
+            if limit and limit[0] == "topk":
+                parts = [topK(pd.concat(parts + [topK(chunk, *limit[1:])]), *limit[1:])]
+                continue
+            parts.append(chunk)
+            rows += len(chunk)
+            if limit and rows >= limit[1]:
+                break
+
+        df = pd.concat(parts) if parts else applySteps(self.read(usecols, 0), steps[:prefix])
+        return applySteps(df, steps[prefix:])
+
+    def count(self):
+        return len(self.select([]).collect())
+
+def applySteps(df: pd.DataFrame, steps: list[tuple]):
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+        if step[0] == "filter":
+            mask = df.eval(step[1])
+            #   A filter followed by a select is a single take of the matching rows and columns.
+            if i + 1 < len(steps) and steps[i + 1][0] == "select":
+                df = df.loc[mask, steps[i + 1][1]]
+                i += 1
+            else:
+                df = df[mask]
+        elif step[0] == "select":
+            df = df[step[1]]
+        elif step[0] == "sort":
+            df = df.sort_values(step[1], ascending=step[2], kind="stable")
+        elif step[0] == "head":
+            df = df.head(step[1])
+        elif step[0] == "topk":
+            df = topK(df, *step[1:])
+        i += 1
+    return df
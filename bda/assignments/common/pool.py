@@ -0,0 +1,123 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql.mysqlconnector import MySQLDialect_mysqlconnector
+from sqlalchemy.pool import QueuePool
+
+from common.statements import POOLED_ATTRIBUTE, clearStatements
+
+#   Pooled MySQL connections for the DB-API helpers (createConnection/get_conn).
+#   One SQLAlchemy QueuePool per (host, port, user, database, options), created on first use, so
+#   a script pays the TCP and auth handshake once per pooled connection instead of once per call.
+#   - pre-ping: each checkout pings the server first and transparently replaces a dead connection
+#   - recycle: connections older than RECYCLE seconds are replaced before MySQL's wait_timeout
+#   - session state: on checkin the transaction is rolled back and the session reset
+#     (COM_RESET_CONNECTION), so an isolation level or user variable set by one borrower never
+#     leaks into the next; the reset also drops prepared statements, so their cache is cleared.
+#     On checkout autocommit and the isolation level are set as requested.
+#
+#   connect() returns a proxy that behaves like the mysql.connector connection (cursor, commit,
+#   rollback, with-block) and whose close() returns it to the pool.
+
+POOL_SIZE = 8
+MAX_OVERFLOW = 56
+RECYCLE = 3600
+
+#   The pool only needs the dialect to know how to ping a mysql.connector connection.
+DIALECT = MySQLDialect_mysqlconnector(dbapi=mysql.connector)
+
+_pools = {}
+_poolsLock = threading.Lock()
+
+
+def resetSession(dbapiConnection, record):
+    if dbapiConnection is not None:
+        clearStatements(dbapiConnection)
+        dbapiConnection.cmd_reset_connection()
+
+def getPool(host: str, user: str, password: str, database: str | None = None, port: int = 3306,
+            size: int = POOL_SIZE, overflow: int = MAX_OVERFLOW, recycle: int = RECYCLE, **options):
+    key = (host, port, user, database, tuple(sorted(options.items())))
+    with _poolsLock:
+        if key not in _pools:
+            def creator():
+                connection = mysql.connector.connect(host=host, port=port, user=user, password=password, database=database, **options)
+                #   The statement cache must not reconnect it: a dead connection is the pool's to replace.
+                setattr(connection, POOLED_ATTRIBUTE, True)
+                return connection
+            pool = QueuePool(creator, pool_size=size, max_overflow=overflow, recycle=recycle, pre_ping=True, reset_on_return="rollback", dialect=DIALECT)
+            event.listen(pool, "checkin", resetSession)
+            _pools[key] = pool
+        return _pools[key]
+
+def connect(host: str, user: str, password: str, database: str | None = None, autocommit: bool = False,
+            isolationLevel: str | None = None, port: int = 3306, **options):
+    connection = getPool(host, user, password, database, port, **options).connect()
+    dbapiConnection = connection.dbapi_connection
+    dbapiConnection.autocommit = autocommit
+    if isolationLevel is not None:
+        with dbapiConnection.cursor() as cursor:
+            cursor.execute(f"SET SESSION TRANSACTION ISOLATION LEVEL {isolationLevel}")
+    return connection
+
+def disposePools():
+    with _poolsLock:
+        for pool in _pools.values():
+            pool.dispose()
+        _pools.clear()
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Each thread acquires a connection, runs one query and releases it, `queries` times, once with
+#   a fresh mysql.connector.connect per query and once through the pool.
+def benchmark(host: str, user: str, password: str, database: str | None = None, threadCounts: list[int] = [1, 8, 64], queries: int = 200):
+    def fresh():
+        return mysql.connector.connect(host=host, user=user, password=password, database=database)
+
+    def pooled():
+        return connect(host, user, password, database)
+
+    def worker(acquire, count):
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            connection = acquire()
+            latencies.append(time.perf_counter() - start)
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            connection.close()
+        return latencies
+
+    results = []
+    for threads in threadCounts:
+        #   Sized to the thread count; pooled() then finds this pool by its key.
+        getPool(host, user, password, database, size=threads, overflow=0)
+        for name, acquire in [("fresh", fresh), ("pooled", pooled)]:
+            perThread = max(queries // threads, 1)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                latencies = np.concatenate([f.result() for f in [executor.submit(worker, acquire, perThread) for _ in range(threads)]])
+            elapsed = time.perf_counter() - start
+            results.append({
+                "threads": threads,
+                "connections": name,
+                "acquire_ms": latencies.mean() * 1000,
+                "acquire_p99_ms": np.percentile(latencies, 99) * 1000,
+                "queries/s": len(latencies) / elapsed,
+            })
+            print(results[-1])
+        disposePools()
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    host, user, password = (sys.argv[1:4] + ["localhost", "root", "root"][len(sys.argv[1:4]):])
+    database = sys.argv[4] if len(sys.argv) > 4 else None
+    print(benchmark(host, user, password, database).to_string(index=False))
@@ -0,0 +1,212 @@
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from mysql.connector.abstracts import MySQLConnectionAbstract
+from sqlalchemy import Connection, Engine
+
+from common.catalogue import applySchema, cleanCatalogue, syntheticCatalogue
+from common.results import dbapiConnection, streamQuery
+from common.statements import normalizeSQL
+
+#   Result cache for read queries, keyed by backend + normalized query + parameters.
+#   Entries leave the cache when:
+#   - they are older than `ttl` seconds
+#   - `capacity` entries are exceeded (least recently used first)
+#   - a table/collection they read from was written to since they were computed
+#   The last one works through version counters: every write helper in common (bulkLoad,
+#   updateByName/deleteByName, ingestSQL/ingestMongo, the mongo* batch helpers) and the direct
+#   writes of the tp scripts call invalidateTable/invalidateCollection, and an entry remembers the
+#   versions of its tables from before the query ran. Writes that bypass those helpers (raw SQL in
+#   a shell) are only caught by the TTL.
+#
+#   SQL versions are per table name, whatever the connection, and MongoDB ones per
+#   "database.collection": a write may throw away more than it needs to, never less.
+#   Cached results are shared between callers and must not be modified.
+
+DEFAULT_CAPACITY = 256
+DEFAULT_TTL = 300.0
+
+#   Tables a statement reads or writes, when the caller does not list them.
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+`?(\w+)`?", re.IGNORECASE)
+
+
+def tablesOf(sql: str):
+    return sorted({table.lower() for table in TABLE_PATTERN.findall(sql)})
+
+def frozenParams(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return repr(sorted(params.items()))
+    return repr(tuple(params))
+
+def sqlBackend(con):
+    if isinstance(con, (Engine, Connection)):
+        url = con.engine.url
+        return f"{url.get_backend_name()}://{url.host or ''}:{url.port or ''}/{url.database or ''}"
+    raw = dbapiConnection(con)
+    if isinstance(raw, sqlite3.Connection):
+        return f"sqlite:///{raw.execute('PRAGMA database_list').fetchone()[2] or id(raw)}"
+    if isinstance(raw, MySQLConnectionAbstract):
+        return f"mysql://{raw.server_host}:{raw.server_port}/{raw.database or ''}"
+    return f"{type(raw).__name__}:{id(raw)}"
+
+def mongoBackend(col):
+    return f"mongodb:{id(col.database.client)}"
+
+#-------------------------------------------------------------------------------------------------#
+
+class QueryCache:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ttl: float = DEFAULT_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stale = 0
+        self.evicted = 0
+
+    def snapshot(self, targets: list[tuple[str, str]]):
+        return tuple(self.versions.get(target, 0) for target in targets)
+
+    def invalidate(self, kind: str, name: str):
+        with self.lock:
+            self.versions[(kind, name)] = self.versions.get((kind, name), 0) + 1
+
+    def lookup(self, key, targets: list[tuple[str, str]]):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, versions, result = entry
+                if time.monotonic() > expires:
+                    self.expired += 1
+                elif versions != self.snapshot(targets):
+                    self.stale += 1
+                else:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return True, result
+                del self.entries[key]
+            self.misses += 1
+            return False, self.snapshot(targets)
+
+    def store(self, key, versions: tuple, result):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, versions, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evicted += 1
+
+    #   The result of compute() for this key, run only on a miss. targets are the (kind, name)
+    #   version counters the result depends on.
+    def get(self, backend: str, query: str, params, targets: list[tuple[str, str]], compute):
+        key = (backend, query, frozenParams(params))
+        found, value = self.lookup(key, targets)
+        if found:
+            return value
+        result = compute()
+        self.store(key, value, result)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "stale": self.stale,
+            "evicted": self.evicted,
+            "size": len(self.entries),
+        }
+
+#   Shared by every helper below and by the write helpers that invalidate it.
+_cache = QueryCache()
+
+
+def queryCache():
+    return _cache
+
+def invalidateTable(table: str):
+    _cache.invalidate("sql", table.lower())
+
+def invalidateCollection(col):
+    _cache.invalidate("mongo", col.full_name)
+
+def cacheStats():
+    return _cache.stats()
+
+#-------------------------------------------------------------------------------------------------#
+
+#   All rows of a SELECT as a list of tuples.
+def cachedSQL(con, sql: str, params: tuple | dict | None = None, tables: list[str] | None = None):
+    query = normalizeSQL(sql)
+    targets = [("sql", table.lower()) for table in (tables or tablesOf(query))]
+    return _cache.get(sqlBackend(con), query, params, targets,
+                      lambda: [row for batch in streamQuery(con, sql, params) for row in batch])
+
+def mongoKey(col, operation: str, *spec):
+    return f"{operation} " + json.dumps(spec, default=str)
+
+def cachedFind(col, filter: dict, sort: list[tuple[str, int]] | None = None, limit: int = 0, projection: dict | None = None):
+    def compute():
+        cursor = col.find(filter, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+    return _cache.get(mongoBackend(col), mongoKey(col, "find", col.full_name, filter, sort, limit, projection), None,
+                      [("mongo", col.full_name)], compute)
+
+#   Pipelines writing elsewhere ($out/$merge) are not cached.
+def cachedAggregate(col, pipeline: list[dict]):
+    if any("$out" in stage or "$merge" in stage for stage in pipeline):
+        return list(col.aggregate(pipeline))
+    return _cache.get(mongoBackend(col), mongoKey(col, "aggregate", col.full_name, pipeline), None,
+                      [("mongo", col.full_name)], lambda: list(col.aggregate(pipeline)))
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Repeated identical reads on a SQLite copy of the catalogue, uncached and cached, with a
+#   write every `writeEvery` queries.
+def benchmark(queries: int = 2000, writeEvery: int = 100):
+    connection = sqlite3.connect(":memory:")
+    cleanCatalogue(applySchema(syntheticCatalogue(100_000))).to_sql("star_clusters", connection, index=False)
+    statements = ["SELECT avg(FeH) FROM star_clusters WHERE age > 2",
+                  "SELECT name, Diam_pc FROM star_clusters ORDER BY Diam_pc DESC LIMIT 5",
+                  "SELECT count(*) FROM star_clusters WHERE Plx > 1"]
+    results = []
+    for mode in ("uncached", "cached"):
+        _cache.clear()
+        start = time.perf_counter()
+        for i in range(queries):
+            if i % writeEvery == 0:
+                connection.execute("UPDATE star_clusters SET age = age WHERE rowid = 1")
+                invalidateTable("star_clusters")
+            sql = statements[i % len(statements)]
+            if mode == "cached":
+                cachedSQL(connection, sql)
+            else:
+                connection.execute(sql).fetchall()
+        results.append({"mode": mode, "queries/s": queries / (time.perf_counter() - start)})
+    connection.close()
+    print(cacheStats())
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    print(benchmark(*(int(arg) for arg in sys.argv[1:3])).to_string(index=False))
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from mysql.connector.abstracts import MySQLConnectionAbstract
+from sqlalchemy import Connection
+
+#   Streaming SQL results in fetchmany() batches instead of one fetchall().
+#   With mysql.connector the cursor is unbuffered, so rows stay on the server side of the socket
+#   until a batch asks for them and memory stays at one batch whatever the result size. (SQLAlchemy's
+#   stream_results is not available for mysqlconnector, so SQLAlchemy connections are unwrapped to
+#   their DB-API connection.) Batches come as lists of tuples, dicts of NumPy columns or DataFrames.
+#
+#   A query can be given a connection (DB-API, pooled or SQLAlchemy) or an existing cursor; in the
+#   latter case make sure the cursor is not buffered, or the whole result is fetched up front.
+
+DEFAULT_FETCH_SIZE = 10_000
+OUTPUTS = ("rows", "numpy", "pandas")
+
+
+def dbapiConnection(con):
+    if isinstance(con, Connection):
+        con = con.connection
+    return getattr(con, "dbapi_connection", con)
+
+def isCursor(source):
+    return hasattr(source, "fetchmany")
+
+def openCursor(con):
+    con = dbapiConnection(con)
+    if isinstance(con, MySQLConnectionAbstract):
+        return con.cursor(buffered=False)
+    return con.cursor()
+
+def fetchBatches(cursor, batchSize: int = DEFAULT_FETCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(batchSize)
+        if not rows:
+            return
+        yield rows
+
+def columnBatch(rows: list[tuple], columns: list[str], output: str):
+    if output == "rows":
+        return rows
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    if output == "pandas":
+        return frame
+    return {col: frame[col].to_numpy() for col in columns}
+
+def streamQuery(source, sql: str, params: tuple | dict | None = None, batchSize: int = DEFAULT_FETCH_SIZE, output: str = "rows"):
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown output {output}, expected one of {OUTPUTS}")
+    cursor = source if isCursor(source) else openCursor(source)
+    try:
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description or []]
+        for rows in fetchBatches(cursor, batchSize):
+            yield columnBatch(rows, columns, output)
+    finally:
+        if cursor is not source:
+            cursor.close()
+
+def countRows(batches):
+    return sum(len(batch) if not isinstance(batch, dict) else len(next(iter(batch.values()), [])) for batch in batches)
+
+#   Whole result as one DataFrame, for results known to fit in memory.
+def queryFrame(source, sql: str, params: tuple | dict | None = None, batchSize: int = DEFAULT_FETCH_SIZE):
+    frames = list(streamQuery(source, sql, params, batchSize, "pandas"))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def queryArrays(source, sql: str, params: tuple | dict | None = None, batchSize: int = DEFAULT_FETCH_SIZE):
+    batches = list(streamQuery(source, sql, params, batchSize, "numpy"))
+    if not batches:
+        return {}
+    return {col: np.concatenate([batch[col] for batch in batches]) for col in batches[0]}
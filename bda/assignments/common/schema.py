@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import (BigInteger, Boolean, DateTime, Double, Float, Integer,
+                        Numeric, SmallInteger, String, Text)
+from sqlalchemy.dialects import mysql
+
+#   MySQL column types inferred from the data rather than from the dtype alone:
+#   - integers get the smallest of TINYINT/SMALLINT/MEDIUMINT/INT/BIGINT holding their range
+#   - floats follow their dtype: float32 columns (the compact catalogue) are FLOAT, float64 ones
+#     DOUBLE, as to_sql makes them. FLOAT for a float64 column is opt-in (preferFloat) and only
+#     taken when every value reads back identically from single precision; a FLOAT column no
+#     longer matches WHERE Plx = 0.41. With preferDecimal, DECIMAL(p, s) when the values are
+#     fixed-point with at most MAX_SCALE decimals
+#   - strings are VARCHAR of their longest value, so every column can be indexed in full
+#   - columns without missing values are NOT NULL (raw DDL only, to_sql's dtype= takes types)
+#   The ranges and lengths are those of the data at hand: for a table that will keep growing,
+#   pass wider types through overrides, e.g. {"id": "INT"}.
+
+INTEGER_TYPES = [
+    ("TINYINT", np.int8),
+    ("SMALLINT", np.int16),
+    ("MEDIUMINT", None),
+    ("INT", np.int32),
+    ("BIGINT", np.int64),
+]
+MEDIUMINT_RANGE = (-2 ** 23, 2 ** 23 - 1)
+MAX_SCALE = 10
+MAX_VARCHAR = 16383
+
+
+def integerType(values: pd.Series):
+    present = values.dropna()
+    if present.empty:
+        return "TINYINT"
+    low, high = int(present.min()), int(present.max())
+    for name, dtype in INTEGER_TYPES:
+        bounds = MEDIUMINT_RANGE if dtype is None else (np.iinfo(dtype).min, np.iinfo(dtype).max)
+        if bounds[0] <= low and high <= bounds[1]:
+            return name
+    raise ValueError(f"{values.name} does not fit in a BIGINT")
+
+#   Float values as the decimals they were parsed from: float32 columns are widened through their
+#   shortest repr, so 51.862 is not seen as 51.86199951171875.
+def decimalValues(values: pd.Series):
+    present = values.dropna().to_numpy()
+    if present.dtype == np.float32:
+        return present.astype(str).astype(np.float64)
+    return present.astype(np.float64)
+
+def floatType(values: pd.Series, preferDecimal: bool = False, preferFloat: bool = False):
+    present = decimalValues(values)
+    present = present[np.isfinite(present)]
+    if preferDecimal and len(present):
+        for scale in range(MAX_SCALE + 1):
+            if np.array_equal(np.round(present, scale), present):
+                digits = len(str(int(np.abs(present).max())))
+                return f"DECIMAL({min(digits + scale, 65)}, {scale})"
+    if values.dtype == np.float32:
+        return "FLOAT"
+    if preferFloat and np.array_equal(present.astype(np.float32).astype(str).astype(np.float64), present):
+        return "FLOAT"
+    return "DOUBLE"
+
+def stringType(values: pd.Series):
+    present = values.dropna().astype(str)
+    length = int(present.str.len().max()) if len(present) else 1
+    return f"VARCHAR({max(length, 1)})" if length <= MAX_VARCHAR else "TEXT"
+
+def mysqlType(values: pd.Series, preferDecimal: bool = False, preferFloat: bool = False):
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return integerType(values)
+    if pd.api.types.is_float_dtype(dtype):
+        return floatType(values, preferDecimal, preferFloat)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "DATETIME"
+    return stringType(values)
+
+def inferSchema(df: pd.DataFrame, preferDecimal: bool = False, overrides: dict | None = None, preferFloat: bool = False):
+    overrides = overrides or {}
+    return {
+        col: {
+            "type": overrides.get(col) or mysqlType(df[col], preferDecimal, preferFloat),
+            "nullable": bool(df[col].isna().any()),
+        }
+        for col in df.columns
+    }
+
+#   Unique, non-null columns: candidates for a UNIQUE KEY (name in the catalogue).
+def suggestIndexes(df: pd.DataFrame):
+    return [col for col in df.columns
+            if not pd.api.types.is_float_dtype(df[col].dtype) and df[col].notna().all() and df[col].is_unique]
+
+def columnDefinitions(df: pd.DataFrame, preferDecimal: bool = False, overrides: dict | None = None, indexes: bool = False,
+                      preferFloat: bool = False):
+    schema = inferSchema(df, preferDecimal, overrides, preferFloat)
+    definitions = [f"`{col}` {spec['type']}{'' if spec['nullable'] else ' NOT NULL'}" for col, spec in schema.items()]
+    if indexes:
+        definitions += [f"UNIQUE KEY `{col}_unique` (`{col}`)" for col in suggestIndexes(df)]
+    return definitions
+
+#-------------------------------------------------------------------------------------------------#
+
+#   The same schema as SQLAlchemy types for df.to_sql(dtype=...). TINYINT and MEDIUMINT only
+#   exist in MySQL, elsewhere (SQLite) the generic type is used.
+def sqlalchemyType(name: str):
+    base = name.split("(")[0]
+    if base == "DECIMAL":
+        precision, scale = (int(part) for part in name[len("DECIMAL("):-1].split(","))
+        return Numeric(precision, scale)
+    if base == "VARCHAR":
+        return String(int(name[len("VARCHAR("):-1]))
+    return {
+        "TINYINT": SmallInteger().with_variant(mysql.TINYINT(), "mysql"),
+        "SMALLINT": SmallInteger(),
+        "MEDIUMINT": Integer().with_variant(mysql.MEDIUMINT(), "mysql"),
+        "INT": Integer(),
+        "BIGINT": BigInteger(),
+        "FLOAT": Float().with_variant(mysql.FLOAT(), "mysql"),
+        "DOUBLE": Double(),
+        "BOOLEAN": Boolean(),
+        "DATETIME": DateTime(),
+        "TEXT": Text(),
+    }[base]
+
+def sqlDtypes(df: pd.DataFrame, preferDecimal: bool = False, overrides: dict | None = None, preferFloat: bool = False):
+    return {col: sqlalchemyType(spec["type"]) for col, spec in inferSchema(df, preferDecimal, overrides, preferFloat).items()}
@@ -0,0 +1,176 @@
+import sys
+import time
+from collections import OrderedDict
+
+import mysql.connector
+from mysql.connector.abstracts import MySQLConnectionAbstract
+
+from common.results import dbapiConnection
+
+#   Server-side prepared statements, cached per connection.
+#   A mysql.connector prepared cursor holds exactly one statement and re-prepares whenever it is
+#   given different SQL, so the cache keeps one prepared cursor per statement, keyed by the SQL
+#   with its whitespace normalized, and evicts the least recently used one (closing it, which
+#   deallocates it on the server) past `capacity`. Repeated point lookups and updates then skip
+#   parsing and planning and send only the parameters.
+#
+#   Prepared statements live in the server session: a reconnect or a session reset (the pool does
+#   one on every checkin) drops them. The cache notices a new connection id and forgets everything,
+#   a statement the server no longer knows (ER_UNKNOWN_STMT_HANDLER) is prepared again once, and
+#   common.pool clears the cache of a connection when it is returned.
+#   A lost connection is only retried for a read outside a transaction, on a connection the cache
+#   may reconnect: anything else would silently drop the statements already run in the transaction
+#   (or commit retried DML alone in a new session), and pooled connections are replaced by the
+#   pool's pre-ping, not reconnected behind its back. Otherwise the error is raised.
+#
+#   The cache is stored on the DB-API connection itself (CACHE_ATTRIBUTE), so it goes away with
+#   the connection instead of a module-level registry keeping closed connections alive.
+#   On connections other than MySQL (sqlite3 in tests) plain cursors are cached instead; sqlite3
+#   connections take no attributes, so there the caller holds on to the returned cache.
+
+DEFAULT_CAPACITY = 64
+
+ER_UNKNOWN_STMT_HANDLER = 1243
+#   CR_SERVER_GONE_ERROR, CR_SERVER_LOST
+CONNECTION_LOST = {2006, 2013}
+READ_STATEMENTS = {"SELECT", "SHOW", "DESCRIBE", "EXPLAIN"}
+
+#   Set by common.pool on the connections it creates.
+POOLED_ATTRIBUTE = "_pooled"
+
+#   One cache per DB-API connection, until clearStatements (called by the pool on checkin).
+CACHE_ATTRIBUTE = "_statementCache"
+
+
+def normalizeSQL(sql: str):
+    return " ".join(sql.split()).rstrip(";").rstrip()
+
+class StatementCache:
+    def __init__(self, connection, capacity: int = DEFAULT_CAPACITY):
+        self.connection = dbapiConnection(connection)
+        self.capacity = capacity
+        self.cursors = OrderedDict()
+        self.sessionId = self.currentSession()
+        self.hits = 0
+        self.misses = 0
+
+    def currentSession(self):
+        return getattr(self.connection, "connection_id", None)
+
+    def isMySQL(self):
+        return isinstance(self.connection, MySQLConnectionAbstract)
+
+    def clear(self):
+        for _, cursor in self.cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.cursors.clear()
+
+    def cursor(self, sql: str):
+        if self.currentSession() != self.sessionId:
+            self.clear()
+            self.sessionId = self.currentSession()
+
+        key = normalizeSQL(sql)
+        if key in self.cursors:
+            self.hits += 1
+            self.cursors.move_to_end(key)
+            return self.cursors[key]
+
+        self.misses += 1
+        cursor = self.connection.cursor(prepared=True) if self.isMySQL() else self.connection.cursor()
+        #   The key is stored next to its cursor and passed on every execute: a prepared cursor
+        #   only reuses its statement when given the very same string object.
+        self.cursors[key] = (key, cursor)
+        if len(self.cursors) > self.capacity:
+            _, (_, evicted) = self.cursors.popitem(last=False)
+            evicted.close()
+        return key, cursor
+
+    def canReconnect(self, sql: str, inTransaction: bool):
+        statement = normalizeSQL(sql).split(" ", 1)[0].upper()
+        return statement in READ_STATEMENTS and not inTransaction and not getattr(self.connection, POOLED_ATTRIBUTE, False)
+
+    def execute(self, sql: str, params: tuple | list | dict = ()):
+        inTransaction = bool(getattr(self.connection, "in_transaction", False))
+        try:
+            key, cursor = self.cursor(sql)
+            cursor.execute(key, params)
+        except mysql.connector.Error as e:
+            if e.errno == ER_UNKNOWN_STMT_HANDLER:
+                self.clear()
+            elif e.errno in CONNECTION_LOST and self.canReconnect(sql, inTransaction):
+                self.clear()
+                self.connection.reconnect()
+            else:
+                raise
+            key, cursor = self.cursor(sql)
+            cursor.execute(key, params)
+        return cursor
+
+    #   Rows of a SELECT, fetched before the statement can be executed again.
+    def query(self, sql: str, params: tuple | list | dict = ()):
+        cursor = self.execute(sql, params)
+        return cursor.fetchall()
+
+    def columns(self, sql: str):
+        _, cursor = self.cursors[normalizeSQL(sql)]
+        return [description[0] for description in cursor.description or []]
+
+    #   Affected row count of an INSERT/UPDATE/DELETE.
+    def update(self, sql: str, params: tuple | list | dict = ()):
+        return self.execute(sql, params).rowcount
+
+def statementCache(connection, capacity: int = DEFAULT_CAPACITY):
+    connection = dbapiConnection(connection)
+    cache = getattr(connection, CACHE_ATTRIBUTE, None)
+    if cache is None:
+        cache = StatementCache(connection, capacity)
+        try:
+            setattr(connection, CACHE_ATTRIBUTE, cache)
+        except AttributeError:
+            pass
+    return cache
+
+def clearStatements(connection):
+    connection = dbapiConnection(connection)
+    cache = getattr(connection, CACHE_ATTRIBUTE, None)
+    if cache is not None:
+        cache.clear()
+        delattr(connection, CACHE_ATTRIBUTE)
+
+#-------------------------------------------------------------------------------------------------#
+
+#   Point lookups by name, as an f-string sent unprepared every time and through the cache.
+def benchmark(host: str, user: str, password: str, database: str, lookups: int = 5000, table: str = "star_clusters"):
+    connection = mysql.connector.connect(host=host, user=user, password=password, database=database)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT name FROM {table}")
+        names = [row[0] for row in cursor.fetchall()]
+        names = [names[i % len(names)] for i in range(lookups)]
+
+        start = time.perf_counter()
+        for name in names:
+            cursor.execute(f"SELECT * FROM {table} WHERE name = '{name}'")
+            cursor.fetchall()
+        unprepared = time.perf_counter() - start
+        cursor.close()
+
+        cache = statementCache(connection)
+        start = time.perf_counter()
+        for name in names:
+            cache.query(f"SELECT * FROM {table} WHERE name = %s", (name,))
+        prepared = time.perf_counter() - start
+        clearStatements(connection)
+    finally:
+        connection.close()
+
+    print(f"unprepared: {lookups / unprepared:.0f} lookups/s")
+    print(f"prepared (cached): {lookups / prepared:.0f} lookups/s")
+
+if __name__ == "__main__":
+    host, user, password, database = (sys.argv[1:5] + ["localhost", "root", "root", "astronomy_db"][len(sys.argv[1:5]):])
+    benchmark(host, user, password, database)
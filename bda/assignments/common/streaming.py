@@ -0,0 +1,200 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+#   Also runnable as `python common/streaming.py`, like the tp scripts.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import CATALOGUE_PATH, floatColumns
+
+#   Chunked counterparts of the tp1 operations.
+#   Each one reads the CSV with read_csv(chunksize=...), keeps only a small mergeable partial
+#   result per chunk and combines them at the end, so memory stays flat whatever the file size.
+#   Float columns are read as float64, so results print as the in-memory path's do (0.41, not
+#   float32's 0.4099999964237213).
+
+DEFAULT_CHUNK_SIZE = 100_000
+MEDIAN_BINS = 4096
+
+
+def floatDtypes():
+    return {column: np.float64 for column in floatColumns()}
+
+def readChunks(path: str, chunkSize: int = DEFAULT_CHUNK_SIZE, columns: list[str] | None = None):
+    return pd.read_csv(path, chunksize=chunkSize, usecols=columns, dtype=floatDtypes())
+
+#   Partial moments are kept as (count, mean, M2) and merged with Chan et al.'s parallel formula.
+#   It carries the same information as (count, sum, sum of squares) but does not lose precision
+#   when the variance is small compared to the mean. +-inf values take part in the moments (the
+#   mean becomes +-inf, as with pandas) but are only counted for the median, whose histogram
+#   spans the finite min/max.
+def emptyMoments():
+    return {"count": 0, "mean": 0.0, "m2": 0.0, "min": np.inf, "max": -np.inf, "below": 0, "above": 0}
+
+def chunkMoments(values: pd.Series):
+    values = values.dropna().to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return emptyMoments()
+    finite = values[np.isfinite(values)]
+    with np.errstate(invalid="ignore"):
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+    return {
+        "count": len(values),
+        "mean": mean,
+        "m2": m2,
+        "min": finite.min() if len(finite) else np.inf,
+        "max": finite.max() if len(finite) else -np.inf,
+        "below": int(np.isneginf(values).sum()),
+        "above": int(np.isposinf(values).sum()),
+    }
+
+def mergeMoments(a: dict, b: dict):
+    if a["count"] == 0:
+        return dict(b)
+    if b["count"] == 0:
+        return dict(a)
+    count = a["count"] + b["count"]
+    merged = {
+        "count": count,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+        "below": a["below"] + b["below"],
+        "above": a["above"] + b["above"],
+    }
+    #   An infinite mean absorbs the other one (opposite signs give NaN) and leaves no variance.
+    if not (np.isfinite(a["mean"]) and np.isfinite(b["mean"])):
+        with np.errstate(invalid="ignore"):
+            return {**merged, "mean": a["mean"] + b["mean"], "m2": np.nan}
+    delta = b["mean"] - a["mean"]
+    return {
+        **merged,
+        "mean": a["mean"] + delta * b["count"] / count,
+        "m2": a["m2"] + b["m2"] + delta ** 2 * a["count"] * b["count"] / count,
+    }
+
+def std(moments: dict, ddof: int = 1):
+    if moments["count"] <= ddof:
+        return np.nan
+    return np.sqrt(moments["m2"] / (moments["count"] - ddof))
+
+#-------------------------------------------------------------------------------------------------#
+
+def streamHead(path: str, length: int = 5, columns: list[str] | None = None):
+    return pd.read_csv(path, nrows=length, usecols=columns, dtype=floatDtypes())
+
+def streamNulls(path: str, chunkSize: int = DEFAULT_CHUNK_SIZE):
+    nulls = None
+    for chunk in readChunks(path, chunkSize):
+        partial = chunk.isnull().sum()
+        nulls = partial if nulls is None else nulls.add(partial, fill_value=0).astype(int)
+    return nulls
+
+def streamMoments(path: str, column: str, chunkSize: int = DEFAULT_CHUNK_SIZE):
+    moments = emptyMoments()
+    for chunk in readChunks(path, chunkSize, [column]):
+        moments = mergeMoments(moments, chunkMoments(chunk[column]))
+    return moments
+
+#   Exact median in two extra passes over the file, given the moments of the first pass.
+#   Pass one builds a histogram of MEDIAN_BINS equal-width bins over the finite [min, max] and
+#   finds the bin(s) holding the middle order statistic(s); -inf values rank below every bin and
+#   +inf ones above. Pass two keeps only the values falling in those bins and selects the exact
+#   element(s). Memory is bounded by the size of the middle bin(s), which is a small fraction of
+#   the rows unless the column is dominated by one value.
+def streamMedian(path: str, column: str, moments: dict, chunkSize: int = DEFAULT_CHUNK_SIZE):
+    count = moments["count"]
+    if count == 0:
+        return np.nan
+    below, above = moments["below"], moments["above"]
+    ranks = sorted({(count - 1) // 2, count // 2})
+    selected = {rank: -np.inf for rank in ranks if rank < below}
+    selected.update({rank: np.inf for rank in ranks if rank >= count - above})
+    finiteRanks = [rank - below for rank in ranks if rank not in selected]
+    if finiteRanks:
+        selected.update(zip([rank + below for rank in finiteRanks], finiteOrderStatistics(path, column, moments, finiteRanks, chunkSize)))
+    return np.mean([selected[rank] for rank in ranks])
+
+def finiteValues(chunk: pd.DataFrame, column: str):
+    values = chunk[column].dropna().to_numpy(dtype=np.float64)
+    return values[np.isfinite(values)]
+
+def finiteOrderStatistics(path: str, column: str, moments: dict, ranks: list[int], chunkSize: int):
+    low, high = moments["min"], moments["max"]
+    if low == high:
+        return [low] * len(ranks)
+
+    edges = np.linspace(low, high, MEDIAN_BINS + 1)
+    histogram = np.zeros(MEDIAN_BINS, dtype=np.int64)
+    for chunk in readChunks(path, chunkSize, [column]):
+        histogram += np.histogram(finiteValues(chunk, column), bins=edges)[0]
+
+    cumulative = np.cumsum(histogram)
+    bins = [int(np.searchsorted(cumulative, rank, side="right")) for rank in ranks]
+    lower, upper = edges[bins[0]], edges[bins[-1] + 1]
+    before = int(cumulative[bins[0] - 1]) if bins[0] > 0 else 0
+
+    #   np.histogram closes only the last bin on the right, mirror that when collecting.
+    lastBin = bins[-1] == MEDIAN_BINS - 1
+    kept = []
+    for chunk in readChunks(path, chunkSize, [column]):
+        values = finiteValues(chunk, column)
+        inside = (values >= lower) & ((values <= upper) if lastBin else (values < upper))
+        kept.append(values[inside])
+    kept = np.sort(np.concatenate(kept))
+    return list(kept[[rank - before for rank in ranks]])
+
+def streamSummary(path: str, column: str = "Diam_pc", chunkSize: int = DEFAULT_CHUNK_SIZE):
+    moments = streamMoments(path, column, chunkSize)
+    return {
+        "mean": moments["mean"] if moments["count"] else np.nan,
+        "median": streamMedian(path, column, moments, chunkSize),
+        "std": std(moments),
+    }
+
+def streamGrouping(path: str, groupBy: str, column: str = "sigPM", chunkSize: int = DEFAULT_CHUNK_SIZE):
+    partials = None
+    for chunk in readChunks(path, chunkSize, [groupBy, column]):
+        partial = chunk.groupby(groupBy)[column].agg(["sum", "count"])
+        partials = partial if partials is None else partials.add(partial, fill_value=0)
+    if partials is None:
+        return pd.Series(dtype=np.float64, name=column)
+    means = partials["sum"] / partials["count"].where(partials["count"] > 0)
+    return means.sort_index().rename(column)
+
+#   Rows matching the predicate are appended to fileName as each chunk is read, only the
+#   per-column non-null counts are kept in memory.
+def streamFiltering(path: str, columns: list[str], fileName: str, predicate=lambda df: df['Plx'] > 1, chunkSize: int = DEFAULT_CHUNK_SIZE):
+    counts = pd.Series(0, index=columns)
+    header = True
+    for chunk in readChunks(path, chunkSize):
+        filtered = chunk[predicate(chunk)][columns]
+        filtered.to_csv(fileName, mode="w" if header else "a", header=header, index=False)
+        header = False
+        counts = counts.add(filtered.count(), fill_value=0).astype(int)
+    return counts
+
+def streamSaveColumns(path: str, columns: list[str], fileName: str, chunkSize: int = DEFAULT_CHUNK_SIZE):
+    header = True
+    for chunk in readChunks(path, chunkSize, columns):
+        chunk[columns].to_csv(fileName, mode="w" if header else "a", header=header, index=False)
+        header = False
+
+#-------------------------------------------------------------------------------------------------#
+
+#   The streaming summary of every numeric column against the in-memory one (what tp1's summary
+#   prints), with a small chunk size so partials are merged; likelihood and BIC carry +-inf.
+def benchmark(path: str = CATALOGUE_PATH, chunkSize: int = 100):
+    df = pd.read_csv(path)
+    for column in df.select_dtypes("number").columns:
+        with np.errstate(invalid="ignore"):
+            expected = {"mean": df[column].mean(), "median": df[column].median(), "std": df[column].std()}
+        streamed = streamSummary(path, column, chunkSize)
+        for stat, value in expected.items():
+            assert np.isclose(streamed[stat], value, rtol=1e-9, equal_nan=True) or streamed[stat] == value, \
+                f"{column} {stat}: streamed {streamed[stat]}, in memory {value}"
+    print(f"{len(df.select_dtypes('number').columns)} columns agree with the in-memory summary")
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else CATALOGUE_PATH)
@@ -0,0 +1,108 @@
+import heapq
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+#   Top-k selection with the exact semantics of df.sort_values(by, ascending, kind="stable").head(n)
+#   (NaN last, ties kept in their original row order) without sorting the whole frame.
+#
+#   The first sort key decides a threshold value, the n-th best one, by partial selection:
+#   np.partition for numeric, datetime and categorical keys (O(N)) or a bounded heap for
+#   anything else (O(N log n)). Rows strictly better than the threshold are always in the
+#   result; the places left are filled from the rows tied with it, ranked by the remaining keys
+#   the same way (or by row order once no key is left). Missing values rank after every value,
+#   like a last tie group. Only the n chosen rows are finally sorted on all keys.
+
+#   Below this many rows a plain sort is cheaper than the selection bookkeeping.
+SMALL_FRAME = 20_000
+
+def keyValues(values: pd.Series):
+    missing = values.isna().to_numpy()
+    valid = np.flatnonzero(~missing)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()[valid], valid, np.flatnonzero(missing)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.iloc[valid].to_numpy().view("i8"), valid, np.flatnonzero(missing)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        present = values.iloc[valid]
+        if isinstance(present.dtype, np.dtype):
+            return present.to_numpy(), valid, np.flatnonzero(missing)
+        return present.to_numpy(dtype=np.float64), valid, np.flatnonzero(missing)
+    return values.iloc[valid].to_numpy(dtype=object), valid, np.flatnonzero(missing)
+
+def threshold(keys: np.ndarray, n: int, ascending: bool):
+    if keys.dtype != object:
+        kth = n - 1 if ascending else len(keys) - n
+        return np.partition(keys, kth)[kth]
+    if ascending:
+        return heapq.nsmallest(n, keys)[-1]
+    return heapq.nlargest(n, keys)[-1]
+
+def sortedPositions(keys: pd.DataFrame, by: list[str], directions: list[bool]):
+    return keys.reset_index(drop=True).sort_values(by, ascending=directions, kind="stable").index.to_numpy()
+
+#   Positions (not labels) of the top n rows of keys, in no particular order.
+def chosenPositions(keys: pd.DataFrame, by: list[str], directions: list[bool], n: int):
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    if n >= len(keys):
+        return np.arange(len(keys))
+    if not by:
+        return np.arange(n)
+
+    values, valid, missing = keyValues(keys[by[0]])
+    if n >= len(values):
+        rest = chosenPositions(keys.iloc[missing], by[1:], directions[1:], n - len(values))
+        return np.concatenate([valid, missing[rest]])
+
+    t = threshold(values, n, directions[0])
+    better = valid[values < t if directions[0] else values > t]
+    ties = valid[values == t]
+    rest = chosenPositions(keys.iloc[ties], by[1:], directions[1:], n - len(better))
+    return np.concatenate([better, ties[rest]])
+
+def topKPositions(df: pd.DataFrame, by: list[str], directions: list[bool], n: int):
+    keys = df[by]
+    chosen = np.sort(chosenPositions(keys, by, directions, n))
+    return chosen[sortedPositions(keys.iloc[chosen], by, directions)]
+
+def topK(df: pd.DataFrame, by: str | list[str], ascending: bool | list[bool] = True, n: int = 5):
+    by = [by] if isinstance(by, str) else list(by)
+    directions = list(ascending) if isinstance(ascending, (list, tuple)) else [ascending] * len(by)
+    if len(df) < SMALL_FRAME:
+        return df.sort_values(by, ascending=directions, kind="stable").head(max(n, 0))
+    return df.iloc[topKPositions(df, by, directions, n)]
+
+#-------------------------------------------------------------------------------------------------#
+
+def benchmark(sizes: list[int], n: int = 10, repeats: int = 3, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for size in sizes:
+        df = pd.DataFrame({
+            "Plx": rng.gamma(2.0, 0.8, size).astype(np.float32),
+            "flagdispPM": rng.integers(0, 2, size, dtype=np.int8),
+            "age": rng.normal(8.2, 0.8, size),
+        })
+        for label, by, ascending in [("single", "Plx", False), ("multi", ["flagdispPM", "age"], [True, False])]:
+            expected = df.sort_values(by, ascending=ascending, kind="stable").head(n)
+            assert topK(df, by, ascending, n).equals(expected)
+
+            timings = {}
+            for name, run in [("sort_values", lambda: df.sort_values(by, ascending=ascending, kind="stable").head(n)),
+                              ("topK", lambda: topK(df, by, ascending, n))]:
+                best = np.inf
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    run()
+                    best = min(best, time.perf_counter() - start)
+                timings[name] = best
+            rows.append({"rows": size, "key": label, **timings, "speedup": timings["sort_values"] / timings["topK"]})
+            print(rows[-1])
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    sizes = [int(float(s)) for s in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000]
+    print(benchmark(sizes).to_string(index=False))
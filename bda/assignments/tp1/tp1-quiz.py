@@ -1,13 +1,40 @@
+import argparse
+import os
+import sys
 
 import numpy as np
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.binning import BinSpec
+from common.catalogue import loadCatalogue
+from common.groupby import (groupAggregate, groupMoments, mergeGroupMoments,
+                            removeGroupMoments)
+
+#   The summary is saved together with M2_FeH (sum of squared deviations), which with Count and
+#   Mean_FeH is enough to fold new catalogue rows in, or removed ones out, without a rescan:
+#       python tp1-quiz.py --add new_clusters.csv --remove retracted.csv
+SUMMARY_FILE = 'metallicity_summary.csv'
+
 def main():
-    csv = pd.read_csv('../dias_catalogue.csv')
-    
-    filtered = filterData(csv)
-    createdAgeBins = createAgeBins(filtered)
-    groupedAndSummerized = groupAndSummerize(createdAgeBins)
+    parser = argparse.ArgumentParser(description="Metallicity summary per age class")
+    parser.add_argument("--add", nargs="+", default=[], metavar="CSV", help="fold these catalogue rows into the saved summary")
+    parser.add_argument("--remove", nargs="+", default=[], metavar="CSV", help="fold these catalogue rows out of the saved summary")
+    args = parser.parse_args()
+
+    if args.add or args.remove:
+        moments = loadSummary()
+        for path in args.add:
+            moments = mergeGroupMoments(moments, batchMoments(path))
+        for path in args.remove:
+            moments = removeGroupMoments(moments, batchMoments(path))
+        groupedAndSummerized = summaryFromMoments(moments)
+    else:
+        csv = loadCatalogue('../dias_catalogue.csv', compact=False)
+
+        filtered = filterData(csv)
+        createdAgeBins = createAgeBins(filtered)
+        groupedAndSummerized = groupAndSummerize(createdAgeBins)
     sortedAndExported = sortAndExport(groupedAndSummerized)
 
     print(sortedAndExported)
@@ -17,29 +44,53 @@ def filterData(csv: pd.DataFrame):
     return filtered
 
 def createAgeBins(csv: pd.DataFrame):
-    conditions = [
-        (csv['age'] < 100),
-        (csv['age'] >= 100) & (csv['age'] < 1000),
-        (csv['age'] >= 1000)
-    ]
-    choices = ['Young', 'Intermediate', 'Old']
-    csv['AgeClass'] = np.select(conditions, choices, default='Unknown')
+    ageBins = BinSpec([100, 1000], ['Young', 'Intermediate', 'Old'], closed='left')
+    csv['AgeClass'] = ageBins.apply(csv['age'])
     return csv
 
+#   The full rebuild goes through the process-parallel groupAggregate; M2 is recovered from the
+#   sample std as std^2 * (count - 1), 0 for single-row classes.
 def groupAndSummerize(csv: pd.DataFrame):
-    grouped = csv.groupby('AgeClass')['FeH'].agg(
-        Mean_FeH='mean',
-        Std_FeH='std',
-        Count='count'
-    ).reset_index()
-    return grouped
+    grouped = groupAggregate(csv, 'AgeClass', 'FeH', ['mean', 'std', 'count'])
+    return summaryFromMoments(pd.DataFrame({
+        'count': grouped['count'],
+        'mean': grouped['mean'],
+        'm2': (grouped['std'] ** 2 * (grouped['count'] - 1)).fillna(0.0)
+    }))
+
+def summaryFromMoments(moments: pd.DataFrame):
+    count = moments['count']
+    grouped = pd.DataFrame({
+        'Mean_FeH': moments['mean'],
+        'Std_FeH': np.sqrt(moments['m2'] / (count - 1)).where(count > 1),
+        'Count': count,
+        'M2_FeH': moments['m2']
+    })
+    grouped.index.name = 'AgeClass'
+    return grouped.reset_index()
 
 def sortAndExport(csv: pd.DataFrame):
     sorted = csv.sort_values('Mean_FeH', ascending=False)
-    selectColumns = sorted[['AgeClass', 'Mean_FeH', 'Std_FeH', 'Count']]
-    selectColumns.to_csv('metallicity_summary.csv')
+    selectColumns = sorted[['AgeClass', 'Mean_FeH', 'Std_FeH', 'Count', 'M2_FeH']]
+    selectColumns.to_csv(SUMMARY_FILE)
 
     return selectColumns
 
+#-------------------------------------------------------------------------------------------------#
+
+def loadSummary():
+    summary = pd.read_csv(SUMMARY_FILE, index_col=0)
+    if 'M2_FeH' not in summary.columns:
+        raise ValueError(f"{SUMMARY_FILE} has no M2_FeH column, run once without --add/--remove to rebuild it")
+    return pd.DataFrame({
+        'count': summary['Count'].to_numpy(),
+        'mean': summary['Mean_FeH'].to_numpy(),
+        'm2': summary['M2_FeH'].to_numpy()
+    }, index=pd.Index(summary['AgeClass'], name='AgeClass'))
+
+def batchMoments(path: str):
+    batch = pd.read_csv(path, usecols=['age', 'FeH'])
+    return groupMoments(createAgeBins(filterData(batch)), 'AgeClass', 'FeH')
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
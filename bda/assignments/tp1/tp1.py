@@ -1,28 +1,36 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import numpy as np
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue, widen, widenValues
+from common.groupby import groupAggregate
+from common.lazy import LazyFrame, exprColumns
+from common.streaming import (streamFiltering, streamGrouping, streamHead,
+                              streamNulls, streamSaveColumns, streamSummary)
+
 
 def main():
     print("Welcome to the CSV Data CLI!")
     file_name = input("Enter the CSV file name (default: dias_catalogue.csv): ") or "../dias_catalogue.csv"
+    chunk_size = input("Stream the file in chunks of how many rows? (default: load it whole)")
+    if chunk_size:
+        streamingMain(file_name, int(chunk_size))
+        return
     try:
-        csv = pd.read_csv(file_name)
+        csv = loadCatalogue(file_name, compact=False)
     except Exception as e:
         print(f"Error loading file: {e}")
         return
 
     while True:
-        print("\nMenu:")
-        print("1. Show first five rows")
-        print("2. Show dataset info")
-        print("3. Select columns and show rows")
-        print("4. Filter rows (Plx > 1)")
-        print("5. Show missing values per column")
-        print("6. Show summary statistics for Diam_pc")
-        print("7. Group by flagdispPM and show mean sigPM")
-        print("8. Add DistMod column")
-        print("9. Save selected columns to file")
-        print("0. Exit")
+        printMenu()
         choice = input("Choose an option: ")
 
         try:    
@@ -66,6 +74,69 @@ def main():
         except:
             print("An exception occurred")
 
+def printMenu():
+    print("\nMenu:")
+    print("1. Show first five rows")
+    print("2. Show dataset info")
+    print("3. Select columns and show rows")
+    print("4. Filter rows (Plx > 1)")
+    print("5. Show missing values per column")
+    print("6. Show summary statistics for Diam_pc")
+    print("7. Group by flagdispPM and show mean sigPM")
+    print("8. Add DistMod column")
+    print("9. Save selected columns to file")
+    print("0. Exit")
+
+#   Same menu over a file that is never fully loaded, every operation reads it chunk by chunk.
+#   Options that need the whole frame in memory (info, select, sort, add column) are not offered.
+def streamingMain(file_name: str, chunk_size: int):
+    while True:
+        printMenu()
+        choice = input("Choose an option: ")
+
+        try:
+            if choice == "1":
+                number = int(input("How many rows to show? (default: 5)"))
+                print(streamHead(file_name, number))
+            elif choice == "4":
+                cols = input("Enter columns separated by commas: (default: name, Plx, dist_PLX)").split(",")
+                cols = [c.strip() for c in cols]
+                fname = input("Enter output file name for the filtered rows (without .csv): ")
+                streamingFiltering(file_name, cols, fname, chunk_size)
+            elif choice == "6":
+                print(streamNulls(file_name, chunk_size))
+            elif choice == "7":
+                col = input("Enter column: (default: Diam_pc)").split(",")[0]
+                streamingSummary(file_name, col, chunk_size)
+            elif choice == "8":
+                print(streamGrouping(file_name, 'flagdispPM', 'sigPM', chunk_size))
+            elif choice == "10":
+                cols = input("Enter columns to save, separated by commas: ").split(",")
+                cols = [c.strip() for c in cols]
+                fname = input("Enter output file name (without .csv): ")
+                streamSaveColumns(file_name, cols, fname+'.csv', chunk_size)
+            elif choice == "0":
+                print("Exiting.")
+                break
+            elif choice in ("2", "3", "5", "9"):
+                print("Option not available in streaming mode.")
+            else:
+                print("Invalid option. Please try again.")
+        except:
+            print("An exception occurred")
+
+def streamingFiltering(file_name: str, columns: list[str], fileName: str, chunk_size: int):
+    length = streamFiltering(file_name, columns, fileName+'.csv', chunkSize=chunk_size)
+    print(f"Filtered rows written to {fileName}.csv")
+    print(f"Total columns: {length}")
+
+def streamingSummary(file_name: str, column: str, chunk_size: int):
+    stats = streamSummary(file_name, column, chunk_size)
+    print(f"Statistics of column {column}")
+    print(f"Mean: {stats['mean']}")
+    print(f"Median: {stats['median']}")
+    print(f"Standard deviation: {stats['std']}")
+
 def firstFive(csv: pd.DataFrame, length: int = 5):
     firstFive = csv.head(length)
     print(firstFive)
@@ -78,20 +149,17 @@ def datasetInfo(csv: pd.DataFrame):
     print(info)
 
 def selectColumns(csv: pd.DataFrame, columns: list[str] = ["RA_ICRS", "DE_ICRS"], length: int = 10):
-    columnsInfo = csv[columns]
-    firstFive = columnsInfo.head(length)
+    firstFive = LazyFrame(csv).select(columns).head(length).collect()
     print(firstFive)
 
 def filtering(csv: pd.DataFrame, columns: list[str] = ["name", "Plx", "dist_PLX"]):
-    filtered = csv[csv['Plx'] > 1]
-    columnsInfo = filtered[columns]
+    columnsInfo = LazyFrame(csv).filter("Plx > 1").select(columns).collect()
     length = columnsInfo.count()
-    print(filtered[columns])
+    print(columnsInfo)
     print(f"Total columns: {length}")
 
 def sorting(csv: pd.DataFrame, sortBy: list[str], length: int = 5):
-    sorted = csv.sort_values(sortBy)
-    firstFive = sorted.head(length)
+    firstFive = LazyFrame(csv).sort(sortBy).head(length).collect()
     print(firstFive)
 
 def handlingNaN(csv: pd.DataFrame):
@@ -108,7 +176,7 @@ def summary(csv: pd.DataFrame, column: str = "Diam_pc"):
     print(f"Standard deviation: {std}")
 
 def grouping(csv: pd.DataFrame, groupBy: str):
-    group = csv.groupby(groupBy)['sigPM'].mean()
+    group = groupAggregate(csv, groupBy, 'sigPM')['mean'].rename('sigPM')
     print(group)
 
 def addColumn(csv: pd.DataFrame, columnName: str):
@@ -120,5 +188,170 @@ def saveColumnsToFile(csv: pd.DataFrame, columns: list[str], fileName: str):
     selectedColumns = csv[columns]
     selectedColumns.to_csv(fileName+'.csv', index=False)
 
+#-------------------------------------------------------------------------------------------------#
+
+#   Non-interactive mode, e.g.
+#       python tp1.py -o summary:Diam_pc -o group:flagdispPM -o filter:Plx>1 -o save:name,Plx:{stem}_near.csv a.csv b.csv
+#   Operations run in order over each file and filter/select narrow the rows/columns seen by the
+#   ones after them. Files are processed in parallel, one per worker process, and the results of
+#   every file are written out as a single JSON list in the order the files were given.
+#
+#   Leading select/filter/head/sort operations only build a LazyFrame plan, so they read just the
+#   columns and rows they need. The first operation that needs a frame loads it once, with only
+#   the columns it and the operations after it use.
+#
+#   head[:N]                   first N rows (default 5)
+#   info                       shape and dtypes
+#   select:COL,COL             keep only these columns
+#   filter:EXPR                keep rows matching a DataFrame.query expression
+#   sort:COL,COL[:N]           first N rows sorted by the columns (default 5)
+#   nulls                      missing values per column
+#   summary[:COL]              mean/median/std (default Diam_pc)
+#   group:COL[:VALUE]          mean of VALUE per COL (default sigPM)
+#   distmod                    add the DistMod column
+#   save:COL,COL:FILE          write columns to FILE, {stem} is replaced by the input file name
+
+def parseOperation(text: str):
+    op, _, arg = text.partition(":")
+    return op.strip(), arg.strip()
+
+def toJson(value):
+    if isinstance(value, pd.DataFrame):
+        return json.loads(widen(value).to_json(orient="records"))
+    if isinstance(value, pd.Series):
+        return json.loads(widenValues(value).to_json())
+    if isinstance(value, dict):
+        return {str(k): toJson(v) for k, v in value.items()}
+    if isinstance(value, (np.generic, float)):
+        value = value.item() if isinstance(value, np.generic) else value
+        return None if isinstance(value, float) and np.isnan(value) else value
+    return value
+
+def runOperation(csv: pd.DataFrame, op: str, arg: str, stem: str):
+    if op == "head":
+        return csv.head(int(arg or 5)), csv
+    if op == "info":
+        return {"rows": len(csv), "columns": {col: str(dtype) for col, dtype in csv.dtypes.items()}}, csv
+    if op == "select":
+        columns = splitColumns(arg)
+        return columns, csv[columns]
+    if op == "filter":
+        filtered = csv.query(arg)
+        return {"rows": len(filtered)}, filtered
+    if op == "sort":
+        columns, _, length = arg.partition(":")
+        return LazyFrame(csv).sort(splitColumns(columns)).head(int(length or 5)).collect(), csv
+    if op == "nulls":
+        return csv.isnull().sum(), csv
+    if op == "summary":
+        column = arg or "Diam_pc"
+        return {"mean": csv[column].mean(), "median": csv[column].median(), "std": csv[column].std()}, csv
+    if op == "group":
+        groupBy, _, column = arg.partition(":")
+        return groupAggregate(csv, groupBy, column or "sigPM")["mean"].rename(column or "sigPM"), csv
+    if op == "distmod":
+        csv = csv.assign(DistMod=5*np.log10(csv['dist_PLX'])-5)
+        return {"rows": len(csv)}, csv
+    if op == "save":
+        columns, _, fileName = arg.partition(":")
+        fileName = fileName.replace("{stem}", stem)
+        csv[splitColumns(columns)].to_csv(fileName, index=False)
+        return {"file": fileName, "rows": len(csv)}, csv
+    raise ValueError(f"Unknown operation '{op}'")
+
+def splitColumns(arg: str):
+    return [c.strip() for c in arg.split(",")]
+
+#   Columns used from each operation onwards, None when some operation needs all of them.
+def remainingColumns(operations: list[tuple[str, str]]):
+    needed = set()
+    remaining = []
+    for op, arg in reversed(operations):
+        if op in ("head", "info", "nulls"):
+            needed = None
+        elif op == "select":
+            needed = set(splitColumns(arg))
+        elif needed is not None:
+            if op == "filter":
+                used = exprColumns(arg)
+                needed = None if used is None else needed | used
+            elif op == "sort":
+                needed |= set(splitColumns(arg.partition(":")[0]))
+            elif op == "summary":
+                needed |= {arg or "Diam_pc"}
+            elif op == "group":
+                groupBy, _, column = arg.partition(":")
+                needed |= {groupBy, column or "sigPM"}
+            elif op == "distmod":
+                needed = (needed - {"DistMod"}) | {"dist_PLX"}
+            elif op == "save":
+                needed |= set(splitColumns(arg.partition(":")[0]))
+        remaining.append(needed)
+    return remaining[::-1]
+
+def runBatch(file_name: str, operations: list[str]):
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    try:
+        parsed = [parseOperation(text) for text in operations]
+        remaining = remainingColumns(parsed)
+        lazy, csv = LazyFrame(file_name), None
+        results = []
+        for i, (text, (op, arg)) in enumerate(zip(operations, parsed)):
+            if csv is None and op == "select":
+                lazy = lazy.select(splitColumns(arg))
+                result = splitColumns(arg)
+            elif csv is None and op == "filter":
+                lazy = lazy.filter(arg)
+                result = {"rows": lazy.count()}
+            elif csv is None and op == "head":
+                result = lazy.head(int(arg or 5)).collect()
+            elif csv is None and op == "sort":
+                columns, _, length = arg.partition(":")
+                result = lazy.sort(splitColumns(columns)).head(int(length or 5)).collect()
+            else:
+                if csv is None:
+                    needed = remaining[i]
+                    if needed is not None:
+                        lazy = lazy.select([c for c in lazy.columns() if c in needed])
+                    csv = widen(lazy.collect())
+                result, csv = runOperation(csv, op, arg, stem)
+            results.append({"op": text, "result": toJson(result)})
+        return {"file": file_name, "results": results}
+    except Exception as e:
+        return {"file": file_name, "error": f"{type(e).__name__}: {e}"}
+
+def batchMain(argv: list[str]):
+    parser = argparse.ArgumentParser(description="Run CSV Data CLI operations over one or many files.")
+    parser.add_argument("files", nargs="+", help="CSV files to process")
+    parser.add_argument("-o", "--op", action="append", default=[], help="operation to run, may be repeated")
+    parser.add_argument("-s", "--script", help="file with one operation per line")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    operations = list(args.op)
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            operations += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not operations:
+        parser.error("no operations given, use --op or --script")
+
+    workers = max(1, min(args.workers, len(args.files)))
+    if workers == 1:
+        results = [runBatch(f, operations) for f in args.files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(runBatch, args.files, repeat(operations)))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 1 if any("error" in r for r in results) else 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(batchMain(sys.argv[1:]))
     main()
\ No newline at end of file
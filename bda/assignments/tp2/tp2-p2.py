@@ -1,9 +1,16 @@
+import os
+import sys
+
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue
+from common.topk import topK
+
 
 def readCSV(file_name: str):
     try:
-        csv = pd.read_csv(file_name)
+        csv = loadCatalogue(file_name)
     except Exception as e:
         raise Exception(f"Error loading file {e}")
     return csv
@@ -17,8 +24,8 @@ def filterRowsByAge(csv: pd.DataFrame, threshold: int):
     print(rows)
 
 def sortBy(csv: pd.DataFrame, sortBy: str, limit: int):
-    rows = csv.sort_values(by=sortBy)
-    print(rows.head(limit))
+    rows = topK(csv, sortBy, n=limit)
+    print(rows)
 
 def aggregate(csv: pd.DataFrame, column: str, threshold: int):
     filtered = csv[csv['N'] > threshold]
@@ -1,9 +1,15 @@
+import os
+import sys
+
 import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue
+
 # Load CSV
-df = pd.read_csv("../dias_catalogue.csv")
+df = loadCatalogue("../dias_catalogue.csv")
 
 # clean the dataset
 df = df.replace('', None)
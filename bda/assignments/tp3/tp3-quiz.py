@@ -1,10 +1,20 @@
+import asyncio
 import json
+import os
+import sys
 
 import numpy as np
 import pandas as pd
 import pymongo as pm
 from pymongo.database import Collection
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.asyncrunner import DEFAULT_CONCURRENCY, mongoAggregate, mongoCollection, mongoFind, printReport, runSuite
+from common.cursors import streamDocuments
+from common.documents import publicProjection
+from common.results import countRows
+from common.views import ensureView
+
 
 def createConnection(host: str, port: str, user: str, password: str, collection: str):
     client = pm.MongoClient(f"mongodb://{user}:{password}@{host}:{port}/?authSource=admin")
@@ -14,25 +24,43 @@ def createConnection(host: str, port: str, user: str, password: str, collection:
 
 def queryCollection(col: Collection, queries: dict, fields: dict):
     #print(f"Finding with queries: {queries}")
-    res = col.find(queries, fields)
-    for doc in col.find(queries, fields):
-        #print(doc)
-        pass
-    return res.collection
+    count = countRows(streamDocuments(col, queries, fields))
+    print(f"Matched {count} documents")
+    return col
 
 def sortBy(col: Collection, sortByColumn: str, fields: dict, limit: int = 5, descending: bool = False):
     direction = pm.DESCENDING if descending else pm.ASCENDING
-    cursor = col.find({}, fields).sort(sortByColumn, direction).limit(limit)
+    cursor = col.find({}, publicProjection(fields)).sort(sortByColumn, direction).limit(limit)
     for doc in cursor:
         print(doc)
 
-def addFields(col: Collection, new_fields: dict, project_fields: dict):
-    pipeline = [{ "$addFields": new_fields }, { "$project": project_fields }]
-    cursor = col.aggregate(pipeline)
+#   The new fields are materialized into `target` (common.views), refreshed incrementally, and
+#   read back with a find.
+def addFields(col: Collection, new_fields: dict, project_fields: dict, target: str = "clusters_fields"):
+    ensureView(col, target, [{ "$addFields": new_fields }])
+    cursor = col.database[target].find({}, publicProjection(project_fields))
     for doc in cursor:
         #print(doc)
         pass
 
+#   The three queries of main at once, through the async client.
+async def runSuiteConcurrently(host: str, port: str, user: str, password: str, collection: str, concurrency: int = DEFAULT_CONCURRENCY):
+    col = mongoCollection(host, port, user, password, "adb", collection)
+    combined = { "$and": [{ "position.dist_PLX": { "$lt": 300 } }, { "features.Vr": { "$gt": 10 } }] }
+    fields = { "_id": 0, "name": 1, "position.RA_ICRS": 1, "position.DE_ICRS": 1, "features.Vr": 1 }
+    newFields = { "position.sky_coord": [ "$position.RA_ICRS", "$position.DE_ICRS" ], "motion.flag": "fast_mover" }
+    suite = [
+        ("queryCollection", mongoFind(col, combined, fields)),
+        ("sortBy", mongoFind(col, {}, fields, sort=[("features.Vr", pm.DESCENDING)], limit=5)),
+        ("addFields", mongoAggregate(col, [{ "$addFields": newFields }, { "$project": { "_id": 0, "name": 1, "position.sky_coord": 1, "motion.flag": 1 } }])),
+    ]
+    try:
+        results, report = await runSuite(suite, concurrency)
+    finally:
+        await col.database.client.close()
+    printReport(report)
+    return results
+
 def main():
     col = createConnection("localhost", "27017", "root", "root", "star_database")
 
@@ -48,6 +76,8 @@ def main():
     fields = { "position.sky_coord": [ "$position.RA_ICRS", "$position.DE_ICRS" ], "motion.flag": "fast_mover" }
     addFields(queried, fields, { "_id": 0, "name": 1, "position.sky_coord": 1, "motion.flag": 1 })
 
+    asyncio.run(runSuiteConcurrently("localhost", "27017", "root", "root", "star_database"))
+
 if __name__ == "__main__":
     main()
 
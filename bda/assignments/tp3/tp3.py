@@ -1,10 +1,20 @@
-import json
+import os
+import sys
 
 import numpy as np
 import pandas as pd
 import pymongo as pm
 from pymongo.database import Collection
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.batch import mongoBulkWrite
+from common.catalogue import loadCatalogue
+from common.cursors import CURSOR_BATCH_SIZE, streamDocuments
+from common.documents import DEFAULT_BATCH_SIZE, insertFrame, publicProjection
+from common.querycache import invalidateCollection
+from common.results import countRows
+from common.views import deleteRecorded, ensureView, stampUpdate, writeStamp
+
 
 def createConnection(host: str, port: str, user: str, password: str, collection: str):
     client = pm.MongoClient(f"mongodb://{user}:{password}@{host}:{port}/?authSource=admin")
@@ -12,36 +22,54 @@ def createConnection(host: str, port: str, user: str, password: str, collection:
     mycol = mydb[collection]
     return mycol
 
-def insertDocuments(col: Collection, docs):
-    if docs:
-        result = col.insert_many(docs, ordered=False)
-        print(f"Inserted {len(result.inserted_ids)} documents.")
+#   The nested documents are built from the columns and inserted batchSize at a time.
+def insertDocuments(col: Collection, df: pd.DataFrame, batchSize: int = DEFAULT_BATCH_SIZE):
+    if len(df):
+        inserted = insertFrame(col, df, batchSize=batchSize)
+        print(f"Inserted {inserted} documents.")
     else:
         print("No documents to insert.")
     print("Total documents in collection:", col.count_documents({}))
 
-def findAllDocuments(col: Collection):
-    for doc in col.find():
-        print(doc)
+#   The find helpers consume their cursor in batches (common.cursors) and print counts rather
+#   than every document.
+def findAllDocuments(col: Collection, batchSize: int = CURSOR_BATCH_SIZE):
+    count = countRows(streamDocuments(col, batchSize=batchSize))
+    print(f"Found {count} documents")
+    return count
 
-def queryCollection(col: Collection, queries: dict):
+def queryCollection(col: Collection, queries: dict, projection: dict | None = None, batchSize: int = CURSOR_BATCH_SIZE):
     print(f"Finding with queries: {queries}")
-    for doc in col.find(queries):
-        print(doc)
+    count = countRows(streamDocuments(col, queries, projection, batchSize=batchSize))
+    print(f"Matched {count} documents")
+    return count
 
 def sortLimit(col: Collection, column: str, limit: int = 10, descending: bool = False):
     direction = pm.DESCENDING if descending else pm.ASCENDING
-    cursor = col.find().sort(column, direction).limit(limit)
-    for doc in cursor:
-        print(doc)
+    for batch in streamDocuments(col, projection=publicProjection(), sort=[(column, direction)], limit=limit, batchSize=limit or CURSOR_BATCH_SIZE):
+        for doc in batch:
+            print(doc)
 
 def updateDocuments(col: Collection, query: dict, operation: dict):
-    res = col.update_many(query, operation)
+    res = col.update_many(query, stampUpdate(operation, writeStamp(col)))
+    invalidateCollection(col)
     print(f"update_many matched={res.matched_count}, modified={res.modified_count}")
     return res
 
 def deleteDocuments(col: Collection, query: dict):
-    col.delete_many(query)
+    deleteRecorded(col, query)
+    invalidateCollection(col)
+
+#   Several updateDocuments/deleteDocuments calls in one bulk_write round trip, applied in order.
+def bulkUpdateDocuments(col: Collection, operations: list[tuple[dict, dict]]):
+    res = mongoBulkWrite(col, updates=operations)
+    print(f"bulk_write matched={res.matched_count}, modified={res.modified_count}")
+    return res
+
+def bulkDeleteDocuments(col: Collection, queries: list[dict]):
+    res = mongoBulkWrite(col, deletes=queries)
+    print(f"bulk_write deleted={res.deleted_count}")
+    return res
 
 def aggregateMetalBins(col: Collection):
     pipeline = [
@@ -97,19 +125,24 @@ def aggregateMetalBins(col: Collection):
     if dist:
         print(f"Min dist_PLX: {dist[0]['minDist']}, Max dist_PLX: {dist[0]['maxDist']}")
 
-def aggregateComputedFields(col: Collection):
-    pipeline = [
-        {
-            "$project": {
-                "features.radius_pc": { "$divide": ["$features.Diam_pc", 2] },
-                "position.dist_ly": { "$multiply": [ "$position.dist_PLX", 3.26156 ]  },
-                "_id": 0,
-                "name": 1,
-                "features.Diam_pc": 1,
-            }
+#   The computed fields are materialized into their own collection (common.views) and only
+#   recomputed for the documents written since the last refresh; reading them is a plain find.
+COMPUTED_VIEW = "clusters_computed"
+COMPUTED_PIPELINE = [
+    {
+        "$project": {
+            "features.radius_pc": { "$divide": ["$features.Diam_pc", 2] },
+            "position.dist_ly": { "$multiply": [ "$position.dist_PLX", 3.26156 ]  },
+            "name": 1,
+            "features.Diam_pc": 1,
         }
-    ]
-    res = col.aggregate(pipeline)
+    }
+]
+
+def aggregateComputedFields(col: Collection):
+    counts = ensureView(col, COMPUTED_VIEW, COMPUTED_PIPELINE, ["features.radius_pc", "position.dist_ly"])
+    print(f"Refreshed {COMPUTED_VIEW}: {counts}")
+    res = col.database[COMPUTED_VIEW].find({}, publicProjection({"_id": 0}))
     if not res:
         print("No aggregation results")
         return
@@ -118,105 +151,91 @@ def aggregateComputedFields(col: Collection):
     for doc in res:
         print(doc)
 
-def projectionNestedFields(col: Collection, fields: dict):
-    res = col.find({}, fields)
-    if not res:
+def projectionNestedFields(col: Collection, fields: dict, batchSize: int = CURSOR_BATCH_SIZE):
+    count = 0
+    sample = None
+    for batch in streamDocuments(col, projection=publicProjection(fields), batchSize=batchSize):
+        sample = sample or batch[0]
+        count += len(batch)
+    if not count:
         print("No documents found")
-        return
+        return count
 
     print("Projection of nested fields:")
-    for doc in res:
-        print(doc)
+    print(f"{count} documents, e.g. {sample}")
+    return count
 
 def main():
     #   Exercise 1
-    print("Exercise 1: Reading CSV and writing filtered JSON")
-    df = pd.read_csv('dias_catalogue.csv')
-
-    df['position'] = df[['RA_ICRS', 'DE_ICRS', 'Plx', 'dist_PLX']].apply(
-        lambda s: s.to_dict(), axis=1
-    )
-
-    df['features'] = df[['r50', 'Vr', 'age', 'FeH', 'Diam_pc']].apply(
-        lambda s: s.to_dict(), axis=1
-    )
-
-    #   Write out Name and features to a json file
-    df[['name', 'position', 'features']].to_json("dias_catalogue_filtered.json", 
-        orient = "records", 
-        date_format = "iso", 
-        double_precision = 10, 
-        force_ascii = True, 
-        date_unit = "ms", 
-        default_handler = None, 
-        indent=2
-    )
-
-    with open("dias_catalogue_filtered.json", "r", encoding="utf-8") as f:
-        docs = json.load(f) 
-
-        #   Exercise 2
-        print("Exercise 2: Creating MongoDB connection")
-        col = createConnection("localhost", "27017", "root", "root", "star_database")
-
-        #   Exercise 3
-        print("Exercise 3: Inserting documents into MongoDB")
-        insertDocuments(col, docs)
-
-        #   Exercise 4
-        print("Exercise 4: Finding all documents")
-        findAllDocuments(col)
-
-        #   Exercise 5
-        print("Exercise 5: Querying documents with conditions")
-        gtAge = { "features.age": { "$gt": 5 } }
-        ltPlx = { "position.dist_PLX": { "$lt": 100 } }
-        ltFeh = { "features.FeH": { "$lt": -0.5 } }
-        queryCollection(col, gtAge)
-        queryCollection(col, ltPlx)
-        queryCollection(col, ltFeh)
-        combined = { "$and": [ gtAge, ltPlx ] }
-        queryCollection(col, combined)
-
-        #   Exercise 6
-        print("Exercise 6: Sorting and limiting query results")
-        sortLimit(col, "features.age", 3, descending=True)
-        sortLimit(col, "position.dist_PLX", 5, descending=False)
-
-        #   Exercise 7
-        print("Exercise 7: Updating documents")
-        updateDocuments(col, {}, {"$mul": {"features.Diam_pc": 2}})
-        updateDocuments(col, {"features.FeH": {"$gt": 0}}, {"$set": {"features.luminosity": 1.0}})
-
-        total_with_lum = col.count_documents({"features.luminosity": {"$exists": True}})
-        print(f"Docs with features.luminosity present: {total_with_lum}")
-        print("Sample (FeH > 0) with name, Diam_pc, luminosity:")
-        for doc in col.find({"features.FeH": {"$gt": 0}}, {"_id": 0, "name": 1, "features.Diam_pc": 1, "features.luminosity": 1}).limit(3):
-            print(doc)
+    print("Exercise 1: Reading CSV, nesting position and features")
+    df = loadCatalogue('dias_catalogue.csv', compact=False)
+
+    #   Exercise 2
+    print("Exercise 2: Creating MongoDB connection")
+    col = createConnection("localhost", "27017", "root", "root", "star_database")
+
+    #   Exercise 3
+    print("Exercise 3: Inserting documents into MongoDB")
+    insertDocuments(col, df)
+
+    #   Exercise 4
+    print("Exercise 4: Finding all documents")
+    findAllDocuments(col)
+
+    #   Exercise 5
+    print("Exercise 5: Querying documents with conditions")
+    gtAge = { "features.age": { "$gt": 5 } }
+    ltPlx = { "position.dist_PLX": { "$lt": 100 } }
+    ltFeh = { "features.FeH": { "$lt": -0.5 } }
+    queryCollection(col, gtAge)
+    queryCollection(col, ltPlx)
+    queryCollection(col, ltFeh)
+    combined = { "$and": [ gtAge, ltPlx ] }
+    queryCollection(col, combined)
+
+    #   Exercise 6
+    print("Exercise 6: Sorting and limiting query results")
+    sortLimit(col, "features.age", 3, descending=True)
+    sortLimit(col, "position.dist_PLX", 5, descending=False)
+
+    #   Exercise 7
+    print("Exercise 7: Updating documents")
+    bulkUpdateDocuments(col, [
+        ({}, {"$mul": {"features.Diam_pc": 2}}),
+        ({"features.FeH": {"$gt": 0}}, {"$set": {"features.luminosity": 1.0}})
+    ])
+
+    total_with_lum = col.count_documents({"features.luminosity": {"$exists": True}})
+    print(f"Docs with features.luminosity present: {total_with_lum}")
+    print("Sample (FeH > 0) with name, Diam_pc, luminosity:")
+    for doc in col.find({"features.FeH": {"$gt": 0}}, {"_id": 0, "name": 1, "features.Diam_pc": 1, "features.luminosity": 1}).limit(3):
+        print(doc)
 
-        #   Exercise 8
-        print("Exercise 8: Deleting documents")
-        print(f"Documents pre deletion: {col.count_documents({})}")
-        deleteDocuments(col, { "position.dist_PLX": { "$gt": 1000 } })
-        deleteDocuments(col, { "name": "ASCC_10" })
-        print(f"Documents post deletion: {col.count_documents({})}")
-
-        #   Exercise 9
-        print("Exercise 9: Aggregating documents")
-        aggregateMetalBins(col)
-
-        #   Exercise 10
-        print("Exercise 10: Aggregating with computed fields")
-        aggregateComputedFields(col)
-
-        #   Exercise 11
-        print("Exercise 11: Projection of nested fields")
-        print("Show only name, RA_ICRS, DE_ICRS")
-        projectionNestedFields(col, {"_id": 0, "name": 1, "position.RA_ICRS": 1, "position.DE_ICRS": 1})
-        print("Show all fields except _id")
-        projectionNestedFields(col, {"_id": 0})
-        print("Exclude position.Plx field")
-        projectionNestedFields(col, {"position.Plx": 0})
+    #   Exercise 8
+    print("Exercise 8: Deleting documents")
+    print(f"Documents pre deletion: {col.count_documents({})}")
+    bulkDeleteDocuments(col, [
+        { "position.dist_PLX": { "$gt": 1000 } },
+        { "name": "ASCC_10" }
+    ])
+    print(f"Documents post deletion: {col.count_documents({})}")
+
+    #   Exercise 9
+    print("Exercise 9: Aggregating documents")
+    aggregateMetalBins(col)
+
+    #   Exercise 10
+    print("Exercise 10: Aggregating with computed fields")
+    aggregateComputedFields(col)
+
+    #   Exercise 11
+    print("Exercise 11: Projection of nested fields")
+    print("Show only name, RA_ICRS, DE_ICRS")
+    projectionNestedFields(col, {"_id": 0, "name": 1, "position.RA_ICRS": 1, "position.DE_ICRS": 1})
+    print("Show all fields except _id")
+    projectionNestedFields(col, {"_id": 0})
+    print("Exclude position.Plx field")
+    projectionNestedFields(col, {"position.Plx": 0})
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
-import json
-import time
+import os
+import sys
 from typing import Optional
 
 import numpy as np
@@ -8,45 +8,34 @@ import pymongo as pm
 from pymongo.database import Collection
 from sqlalchemy import Connection, create_engine, text
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue
+from common.documents import publicProjection
+from common.harness import measure
+from common.ingest import ingestSQL
+from common.reload import reloadDocuments
+from common.results import countRows, streamQuery
 
-def loadMongoDB(conn: Collection):
-    df = pd.read_csv('../dias_catalogue.csv')
-
-    # Create Nested dict (Object)
-    df['position'] = df[['RA_ICRS', 'DE_ICRS', 'Plx', 'dist_PLX']].apply(
-        lambda s: s.to_dict(), axis=1
-    )
-    df['features'] = df[['r50', 'Vr', 'age', 'FeH', 'Diam_pc']].apply(
-        lambda s: s.to_dict(), axis=1
-    )
-
-    # Write out to a json file
-    df[['name', 'position', 'features']].to_json("../dias_catalogue_filtered.json", 
-    orient = "records", date_format = "epoch", 
-    double_precision = 10, force_ascii = True, date_unit = "ms", 
-    default_handler = None, indent=2)
-
-    with open("../dias_catalogue_filtered.json", "r") as f:
-        stars_data = json.load(f)
 
-        # Step 3: Clear old data (optional, for repeat runs)
-        conn.drop()
+def loadMongoDB(conn: Collection):
+    df = loadCatalogue('../dias_catalogue.csv', compact=False)
 
-        # Step 4: Insert into MongoDB
-        result = conn.insert_many(stars_data)
+    # Bring the collection in line with the catalogue: only new or changed clusters are
+    # written and removed ones deleted, so repeat runs keep the indexes and never empty it
+    counts = reloadDocuments(conn, df)
 
-        print("Inserted documents:", len(result.inserted_ids))
-        print("Total in collection:", conn.count_documents({}))
+    print("Reloaded documents:", counts)
+    print("Total in collection:", conn.count_documents({}))
 
 def loadMySQL(conn: Connection):
     # Load CSV
-    df = pd.read_csv("../dias_catalogue.csv")
+    df = loadCatalogue("../dias_catalogue.csv", compact=False)
 
     # clean the dataset
     df = df.replace('', None)
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
 
-    df.to_sql("star_clusters", conn, if_exists="replace", index=False)
+    ingestSQL(conn.engine, df, "star_clusters", replace=True)
     print("Total in table:", conn.execute(text("SELECT COUNT(*) FROM star_clusters")).fetchone()[0])
 
 
@@ -67,46 +56,30 @@ def createConnectionMongo(host: str, port: str, user: str, password: str, cl: st
 #-------------------------------------------------------------------------------------------------#
 
 def queryMongoDB(conn: Collection, filter: dict, sort: Optional[dict] = None, ascending: bool = True, limit: Optional[int] = None):
-    time_i = time.time()
-    docs_nested = conn.find(filter)
-    if sort:
-        sort_list = [(field, direction) for field, direction in sort.items()]
-        docs_nested = docs_nested.sort(sort_list)
-    if limit:
-        docs_nested = docs_nested.limit(limit)
-    
-    time_f = time.time()
-    docs_list = list(docs_nested)
+    sort_list = [(field, direction) for field, direction in sort.items()] if sort else None
+    # The cursor is lazy: the timing has to include draining it
+    docs_list, elapsed = measure(lambda: conn.find(filter, publicProjection(), sort=sort_list, limit=limit or 0))
     print('docs nested = ', len(docs_list))
-    print('total time pymongo = ', time_f-time_i)
+    print('total time pymongo = ', elapsed)
 
 
 def queryMySQL(conn: Connection, filter: str):
-    time_ip = time.time()
-    result = conn.execute(text(f"SELECT * FROM star_clusters WHERE {filter}"))
-    rows = result.fetchall()
-    time_f = time.time()
-    print('docs mysql = ', len(rows))
-    print('total time mysql = ', time_f-time_ip)
+    rows, elapsed = measure(lambda: countRows(streamQuery(conn, f"SELECT * FROM star_clusters WHERE {filter}")))
+    print('docs mysql = ', rows)
+    print('total time mysql = ', elapsed)
 
 #-------------------------------------------------------------------------------------------------#
 
 def aggregateMongoDB(conn: Collection, pipeline: list):
-    time_i = time.time()
-    docs_nested = conn.aggregate(pipeline)
-    docs_list = list(docs_nested)
-    time_f = time.time()
+    docs_list, elapsed = measure(lambda: conn.aggregate(pipeline))
     print('docs nested = ', len(docs_list))
-    print('total time pymongo = ', time_f-time_i)
+    print('total time pymongo = ', elapsed)
     return docs_list
 
 def aggregateMySQL(conn: Connection, query: str):
-    time_i = time.time()
-    result = conn.execute(text(query))
-    rows = result.fetchall()
-    time_f = time.time()
+    rows, elapsed = measure(lambda: conn.execute(text(query)))
     print('docs mysql = ', len(rows))
-    print('total time mysql = ', time_f-time_i)
+    print('total time mysql = ', elapsed)
     return rows
 
 #-------------------------------------------------------------------------------------------------#
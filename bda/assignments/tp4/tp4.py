@@ -1,5 +1,6 @@
-import json
-import time
+import asyncio
+import os
+import sys
 
 import numpy as np
 import pandas as pd
@@ -7,48 +8,100 @@ import pymongo as pm
 from pymongo.database import Collection
 from sqlalchemy import Connection, create_engine, text
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.asyncrunner import (DEFAULT_CONCURRENCY, mongoAggregate, mongoCollection, mongoFind, mysqlPool,
+                                 printReport, runSuite, sqlQuery)
+from common.binning import BinSpec
+from common.catalogue import loadCatalogue
+from common.groupby import groupAggregate
+from common.harness import measure, mongoCase, mongoPipelineCase, pandasCase, printReport as printBenchmark, runBenchmark, sqlCase, writeReport
+from common.ingest import ingestSQL
+from common.queryir import And, Cmp, Or, Prefix, Query, Range, equivalence
+from common.reload import reloadDocuments
+from common.results import streamQuery
+
+#   Shared by the three aggregate* functions so MongoDB, MySQL and pandas bin FeH the same way.
+FEH_BINS = BinSpec([-1, 0], ["FeH < -1", "-1 ≤ FeH ≤ 0", "FeH > 0"], closed=["left", "right"])
+
+#   Exercises 0-4 as (title, Query): each query is written once and compiled to the MongoDB
+#   filter, the SQL and the pandas mask (common.queryir), so the three backends cannot drift.
+#   "between" is exclusive throughout, as the MongoDB and pandas versions had it.
+EXERCISES = [
+    ("Exercise 0: Basic Query - RA_ICRS > 50",
+     Query(Cmp("RA_ICRS", ">", 50))),
+    ("Exercise 1: Complex Query - Name starts with 'A', RA_ICRS < 180, DE_ICRS between -60 and 60",
+     Query(And(
+        Prefix("name", "A"),
+        Cmp("RA_ICRS", "<", 180),
+        Range("DE_ICRS", -60, 60, closed="neither"),
+     ))),
+    ("Exercise 2: Combined Conditions - age > 4, FeH < 0, sorted by RA_ICRS ascending",
+     Query(And(
+        Cmp("age", ">", 4),
+        Cmp("FeH", "<", 0),
+     ), sort=[("RA_ICRS", 1)])),
+    ("Exercise 3: Range Query - Diam_pc between 5 and 20, age < 9, limit 10 results",
+     Query(And(
+        Range("Diam_pc", 5, 20, closed="neither"),
+        Cmp("age", "<", 9),
+     ), limit=10)),
+    ("Exercise 4: OR Conditions - (RA_ICRS between 100 and 200 and DE_ICRS > 0) or (RA_ICRS < 50 and DE_ICRS < -30)",
+     Query(Or(
+        And(Range("RA_ICRS", 100, 200, closed="neither"), Cmp("DE_ICRS", ">", 0)),
+        And(Cmp("RA_ICRS", "<", 50), Cmp("DE_ICRS", "<", -30)),
+     ))),
+]
+
+#   Exercise 5
+FEH_PIPELINE = [
+    {
+        "$group": {
+            "_id": FEH_BINS.mongoSwitch("$features.FeH"),
+            "avg_Diam_pc": { "$avg": "$features.Diam_pc" },
+            "max_Diam_pc": { "$max": "$features.Diam_pc" },
+            "count": { "$sum": 1 }
+        }
+    },
+    { "$sort": { "_id": 1 } }
+]
+FEH_SQL = f"""
+    SELECT 
+        {FEH_BINS.sqlCase("FeH")} as FeH_bin,
+        AVG(Diam_pc) as avg_Diam_pc,
+        MAX(Diam_pc) as max_Diam_pc,
+        COUNT(*) as count
+    FROM star_clusters 
+    WHERE FeH IS NOT NULL AND Diam_pc IS NOT NULL
+    GROUP BY FeH_bin
+    ORDER BY FeH_bin
+"""
 
-def loadMongoDB(conn: Collection):
-    df = pd.read_csv('../dias_catalogue.csv')
-
-    # Create Nested dict (Object)
-    df['position'] = df[['RA_ICRS', 'DE_ICRS', 'Plx', 'dist_PLX']].apply(
-        lambda s: s.to_dict(), axis=1
-    )
-    df['features'] = df[['r50', 'Vr', 'age', 'FeH', 'Diam_pc']].apply(
-        lambda s: s.to_dict(), axis=1
-    )
-
-    # Write out to a json file
-    df[['name', 'position', 'features']].to_json("../dias_catalogue_filtered.json", 
-    orient = "records", date_format = "epoch", 
-    double_precision = 10, force_ascii = True, date_unit = "ms", 
-    default_handler = None, indent=2)
-
-    with open("../dias_catalogue_filtered.json", "r") as f:
-        stars_data = json.load(f)
 
-        # Step 3: Clear old data (optional, for repeat runs)
-        conn.drop()
+def loadMongoDB(conn: Collection):
+    df = loadCatalogue('../dias_catalogue.csv', compact=False)
 
-        # Step 4: Insert into MongoDB
-        result = conn.insert_many(stars_data)
+    # Bring the collection in line with the catalogue: only new or changed clusters are
+    # written and removed ones deleted, so repeat runs keep the indexes and never empty it
+    counts = reloadDocuments(conn, df)
 
-        print("Inserted documents:", len(result.inserted_ids))
-        print("Total in collection:", conn.count_documents({}))
+    print("Reloaded documents:", counts)
+    print("Total in collection:", conn.count_documents({}))
 
 def loadMySQL(conn: Connection):
-    # Load CSV
-    df = pd.read_csv("../dias_catalogue.csv")
+    # Load CSV, float64 like the documents loadMongoDB writes
+    df = loadCatalogue("../dias_catalogue.csv", compact=False)
 
     # clean the dataset
     df = df.replace('', None)
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
 
-    df.to_sql("star_clusters", conn, if_exists="replace", index=False)
+    #   The load runs on other connections of the engine: end the transaction conn may hold, or
+    #   the DROP TABLE waits on its metadata lock.
+    conn.commit()
+    ingestSQL(conn.engine, df, "star_clusters", replace=True)
 
 def loadPandas():
-    df = pd.read_csv('../dias_catalogue.csv')
+    df = loadCatalogue('../dias_catalogue.csv')
     df['name'] = df['name'].str.strip()
     f =  df[[ 'name','RA_ICRS', 'DE_ICRS', 'Plx', 'dist_PLX', 'Vr', 'age', 'FeH', 'Diam_pc', 'r50']]
     return df
@@ -73,122 +126,103 @@ def createConnectionMongo(host: str, port: str, user: str, password: str, cl: st
 from typing import Optional
 
 
-def queryMongoDB(conn: Collection, filter: dict, sort: Optional[dict] = None, ascending: bool = True, limit: Optional[int] = None):
-    time_i = time.time()
-    docs_nested = conn.find(filter)
-    if sort:
-        sort_list = [(field, direction) for field, direction in sort.items()]
-        docs_nested = docs_nested.sort(sort_list)
-    if limit:
-        docs_nested = docs_nested.limit(limit)
-    
-    time_f = time.time()
-    docs_list = list(docs_nested)
+#   The single-shot timings below call the drivers directly, like benchmarkExercises, so they time
+#   the query and not common.querycache.
+def queryMongoDB(conn: Collection, query: Query):
+    docs_list, elapsed = measure(mongoCase(conn, **query.mongo()))
     print('docs nested = ', len(docs_list))
-    print('total time pymongo = ', time_f-time_i)
+    print('total time pymongo = ', elapsed)
 
 def aggregateMongoDB(conn: Collection):
-    time_i = time.time()
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "$switch": {
-                        "branches": [
-                            { "case": { "$lt": ["$features.FeH", -1] }, "then": "FeH < -1" },
-                            { "case": { "$and": [
-                                { "$gte": ["$features.FeH", -1] },
-                                { "$lte": ["$features.FeH", 0] }
-                            ] }, "then": "-1 ≤ FeH ≤ 0" }
-                        ],
-                        "default": "FeH > 0"
-                    }
-                },
-                "avg_Diam_pc": { "$avg": "$features.Diam_pc" },
-                "max_Diam_pc": { "$max": "$features.Diam_pc" },
-                "count": { "$sum": 1 }
-            }
-        },
-        { "$sort": { "_id": 1 } }
-    ]
-    
-    result = list(conn.aggregate(pipeline))
-    time_f = time.time()
+    result, elapsed = measure(mongoPipelineCase(conn, FEH_PIPELINE))
     
     print('MongoDB aggregation results:', len(result))
-    print('total time MongoDB = ', time_f-time_i)
+    print('total time MongoDB = ', elapsed)
     for doc in result:
         print(f"Bin: {doc['_id']}, Avg: {doc['avg_Diam_pc']:.2f}, Max: {doc['max_Diam_pc']:.2f}, Count: {doc['count']}")
 
 def aggregateMySQL(conn: Connection):
-    time_i = time.time()
-    result = conn.execute(text("""
-        SELECT 
-            CASE 
-                WHEN FeH < -1 THEN 'FeH < -1'
-                WHEN FeH >= -1 AND FeH <= 0 THEN '-1 ≤ FeH ≤ 0'
-                WHEN FeH > 0 THEN 'FeH > 0'
-                ELSE 'Unknown'
-            END as FeH_bin,
-            AVG(Diam_pc) as avg_Diam_pc,
-            MAX(Diam_pc) as max_Diam_pc,
-            COUNT(*) as count
-        FROM star_clusters 
-        WHERE FeH IS NOT NULL AND Diam_pc IS NOT NULL
-        GROUP BY FeH_bin
-        ORDER BY FeH_bin
-    """))
-    rows = result.fetchall()
-    time_f = time.time()
+    rows, elapsed = measure(lambda: [row for batch in streamQuery(conn, FEH_SQL) for row in batch])
     
     print('MySQL aggregation results:', len(rows))
-    print('total time MySQL = ', time_f-time_i)
+    print('total time MySQL = ', elapsed)
     for row in rows:
         print(f"Bin: {row[0]}, Avg: {row[1]:.2f}, Max: {row[2]:.2f}, Count: {row[3]}")
 
-def aggregatePandas(df: pd.DataFrame):
-    time_i = time.time()
-    
-    def create_feh_bins(feh):
-        if pd.isna(feh):
-            return "Unknown"
-        elif feh < -1:
-            return "FeH < -1"
-        elif -1 <= feh <= 0:
-            return "-1 ≤ FeH ≤ 0"
-        else:
-            return "FeH > 0"
-    
+def fehBinsPandas(df: pd.DataFrame):
     df_filtered = df[df['FeH'].notna() & df['Diam_pc'].notna()].copy()
-    df_filtered['FeH_bin'] = df_filtered['FeH'].apply(create_feh_bins)
-    result = df_filtered.groupby('FeH_bin')['Diam_pc'].agg(['mean', 'max', 'count']).reset_index()
+    df_filtered['FeH_bin'] = FEH_BINS.apply(df_filtered['FeH'])
+    return groupAggregate(df_filtered, 'FeH_bin', 'Diam_pc', ['mean', 'max', 'count']).reset_index()
+
+def aggregatePandas(df: pd.DataFrame):
+    result, elapsed = measure(lambda: fehBinsPandas(df))
     
-    time_f = time.time()
     print('Pandas aggregation results:', len(result))
-    print('total time Pandas = ', time_f-time_i)
+    print('total time Pandas = ', elapsed)
     for _, row in result.iterrows():
         print(f"Bin: {row['FeH_bin']}, Avg: {row['mean']:.2f}, Max: {row['max']:.2f}, Count: {row['count']}")
 
 
-def queryMySQL(conn: Connection, filter: str):
-    time_ip = time.time()
-    result = conn.execute(text(f"SELECT * FROM star_clusters WHERE {filter}"))
-    rows = result.fetchall()
-    time_f = time.time()
-    print('docs mysql = ', len(rows))
-    print('total time mysql = ', time_f-time_ip)
-
-def queryPandas(df: pd.DataFrame, filter_condition):
-    time_i = time.time()
-    if isinstance(filter_condition, str):
-        # For simple string conditions, use query()
-        docs = df.query(filter_condition)
-    else:
-        # For complex conditions (lambda functions), call the function
-        docs = filter_condition(df)
-    time_fp = time.time()
+def queryMySQL(conn: Connection, query: Query):
+    rows, elapsed = measure(sqlCase(conn, *query.sql("star_clusters")))
+    print('docs mysql = ', rows)
+    print('total time mysql = ', elapsed)
+
+def queryPandas(df: pd.DataFrame, query: Query):
+    docs, elapsed = measure(pandasCase(df, query.frame))
     print('docs pandas = ', len(docs))
-    print('total time Pandas = ', time_fp-time_i)
+    print('total time Pandas = ', elapsed)
+
+#   Every exercise run on the three backends and compared row by row, so the benchmark below
+#   compares like with like.
+def checkExercises(connMongoDB: Collection, connMySQL: Connection, df: pd.DataFrame):
+    equivalent = True
+    for title, query in EXERCISES:
+        report = equivalence(query, col=connMongoDB, con=connMySQL, df=df)
+        print(f"{title.split(':')[0]}: {'equivalent' if report['equivalent'] else 'MISMATCH'} {report['rows']}")
+        for backend, mismatch in report["mismatches"].items():
+            print(f"  {backend}: {mismatch}")
+        equivalent &= report["equivalent"]
+    return equivalent
+
+#   Every exercise on the three backends through common.harness: warmed up, repeated, timed to
+#   the last row and without the query cache. The report is written to `path` (.json or .csv).
+def benchmarkExercises(connMongoDB: Collection, connMySQL: Connection, df: pd.DataFrame, path: Optional[str] = None):
+    suite = []
+    for title, query in EXERCISES:
+        suite.append((title.split(':')[0], {
+            "MongoDB": mongoCase(connMongoDB, **query.mongo()),
+            "MySQL": sqlCase(connMySQL, *query.sql("star_clusters")),
+            "pandas": pandasCase(df, query.frame),
+        }))
+    suite.append(("Exercise 5", {
+        "MongoDB": mongoPipelineCase(connMongoDB, FEH_PIPELINE),
+        "MySQL": sqlCase(connMySQL, FEH_SQL),
+        "pandas": pandasCase(df, fehBinsPandas),
+    }))
+    report = runBenchmark(suite)
+    printBenchmark(report)
+    if path:
+        writeReport(report, path)
+    return report
+
+#   Every MongoDB and MySQL query of the exercises submitted at once, over async clients.
+async def runSuiteConcurrently(concurrency: int = DEFAULT_CONCURRENCY):
+    col = mongoCollection("localhost", "27017", "root", "root", "openClusters", "cluster")
+    pool = await mysqlPool("localhost", "root", "root", "openclusters", size=concurrency)
+    suite = []
+    for title, query in EXERCISES:
+        suite.append((f"{title.split(':')[0]} MongoDB", mongoFind(col, **query.mongo())))
+        suite.append((f"{title.split(':')[0]} MySQL", sqlQuery(pool, *query.sql("star_clusters"))))
+    suite.append(("Exercise 5 MongoDB", mongoAggregate(col, FEH_PIPELINE)))
+    suite.append(("Exercise 5 MySQL", sqlQuery(pool, FEH_SQL)))
+    try:
+        results, report = await runSuite(suite, concurrency)
+    finally:
+        await pool.close_pool()
+        await col.database.client.close()
+    printReport(report)
+    return results
 
 def main():
 
@@ -200,64 +234,11 @@ def main():
     loadMySQL(connMySQL)
 
     #   Part 2
-    print("Exercise 0: Basic Query - RA_ICRS > 50")
-    queryMongoDB(connMongoDB, {'position.RA_ICRS': { "$gt": 50 }})
-    queryMySQL(connMySQL, "RA_ICRS > 50")
-    queryPandas(connPandas, "RA_ICRS > 50")
-
-    #   Exercise 1
-    print("Exercise 1: Complex Query - Name starts with 'A', RA_ICRS < 180, DE_ICRS between -60 and 60")
-    queryMongoDB(connMongoDB, {
-        'name': { "$regex": "^A" }, 
-        'position.RA_ICRS': { "$lt": 180 }, 
-        'position.DE_ICRS': { "$gt": -60, "$lt": 60 }
-        })
-    queryMySQL(connMySQL, "name LIKE 'A%' AND RA_ICRS < 180 AND DE_ICRS BETWEEN -60 AND 60")
-    queryPandas(connPandas, lambda df: df[
-        (df['name'].str.startswith('A', na=False)) & 
-        (df['RA_ICRS'] < 180) & 
-        (df['DE_ICRS'] > -60) & 
-        (df['DE_ICRS'] < 60)
-    ])
-
-    #   Exercise 2
-    print("Exercise 2: Combined Conditions - age > 4, FeH < 0, sorted by RA_ICRS ascending")
-    queryMongoDB(connMongoDB, {
-        'features.age': { "$gt": 4 },
-        'features.FeH': { "$lt": 0 },
-    }, sort={ 'position.RA_ICRS': 1 }, ascending=True)
-    queryMySQL(connMySQL, "age > 4 AND FeH < 0 ORDER BY RA_ICRS ASC")
-    queryPandas(connPandas, lambda df: df[
-        (df['age'] > 4) & 
-        (df['FeH'] < 0)
-    ].sort_values(by='RA_ICRS', ascending=True))
-
-    #   Exercise 3
-    print("Exercise 3: Range Query - Diam_pc between 5 and 20, age < 9, limit 10 results")
-    queryMongoDB(connMongoDB, {
-        'features.Diam_pc': { "$gt": 5, "$lt": 20 },
-        'features.age': { "$lt": 9 },
-    }, limit=10)
-    queryMySQL(connMySQL, "Diam_pc BETWEEN 5 AND 20 AND age < 9 LIMIT 10")
-    queryPandas(connPandas, lambda df: df[
-        (df['Diam_pc'] > 5) & 
-        (df['Diam_pc'] < 20) & 
-        (df['age'] < 9)
-    ].head(10))
-
-    #   Exercise 4
-    print("Exercise 4: OR Conditions - (RA_ICRS between 100 and 200 and DE_ICRS > 0) or (RA_ICRS < 50 and DE_ICRS < -30)")
-    queryMongoDB(connMongoDB, {
-        '$or': [
-        { 'position.RA_ICRS': { "$gt": 100, "$lt": 200 }, 'position.DE_ICRS': { "$gt": 0 } },
-        { 'position.RA_ICRS': { "$lt": 50 }, 'position.DE_ICRS': { "$lt": -30 } }
-        ]
-    })
-    queryMySQL(connMySQL, "(RA_ICRS BETWEEN 100 AND 200 AND DE_ICRS > 0) OR (RA_ICRS < 50 AND DE_ICRS < -30)")
-    queryPandas(connPandas, lambda df: df[
-        ((df['RA_ICRS'] > 100) & (df['RA_ICRS'] < 200) & (df['DE_ICRS'] > 0)) |
-        ((df['RA_ICRS'] < 50) & (df['DE_ICRS'] < -30))
-    ])
+    for title, query in EXERCISES:
+        print(title)
+        queryMongoDB(connMongoDB, query)
+        queryMySQL(connMySQL, query)
+        queryPandas(connPandas, query)
 
     #   Exercise 5
     print("Exercise 5: Aggregation - Average and Max Diam_pc by FeH bins")
@@ -265,6 +246,15 @@ def main():
     aggregateMySQL(connMySQL)
     aggregatePandas(connPandas)
 
+    print("All exercises, checked for equivalence")
+    checkExercises(connMongoDB, connMySQL, connPandas)
+
+    print("All exercises, benchmarked")
+    benchmarkExercises(connMongoDB, connMySQL, connPandas, "tp4_benchmark.json")
+
+    print("All exercises, concurrently")
+    asyncio.run(runSuiteConcurrently())
+
 
 
 if __name__ == "__main__":
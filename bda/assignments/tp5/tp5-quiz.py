@@ -1,16 +1,14 @@
+import os
+import sys
 import threading
 import time
 
-import mysql.connector
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.pool import connect
 
 
 def get_conn():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="openclusters"
-    )
+    return connect("localhost", "root", "root", "openclusters")
 
 
 def unsafe_update(name, delay, col):
@@ -1,12 +1,20 @@
+import os
+import sys
+
 import mysql.connector
 import numpy as np
 import pandas as pd
 from mysql.connector.cursor import MySQLCursorAbstract
 from sqlalchemy import Connection, create_engine, text
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue
+from common.ingest import ingestSQL
+from common.pool import connect
+
 
 def createAndLoadMySQL(host: str, user: str, password: str):
-    df = pd.read_csv("../dias_catalogue.csv")
+    df = loadCatalogue("../dias_catalogue.csv", compact=False)
     df = df.replace('', None)
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
 
@@ -20,20 +28,14 @@ def createAndLoadMySQL(host: str, user: str, password: str):
         
     df.insert(0, 'id', range(1, len(df) + 1))
 
-    df.to_sql(name='clusters', con=engine, if_exists='replace', index=False)
+    ingestSQL(engine, df, 'clusters', replace=True, overrides={'id': 'INT'})
     
     with engine.connect() as conn:
         conn.execute(text("ALTER TABLE clusters ADD PRIMARY KEY (id)"))
         conn.commit()
 
 def createConnection(host: str, user: str, password: str, database: str, autocommit: bool = True):
-    mydb = mysql.connector.connect(
-        host=host,
-        user=user,
-        password=password,
-        database=database,
-        autocommit=autocommit
-    )
+    mydb = connect(host, user, password, database, autocommit=autocommit)
     return mydb
 
 def basicTransaction():
@@ -1,15 +1,21 @@
+import os
+import sys
 import threading
-import time
 from configparser import Error
 
-import mysql.connector
 import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue
+from common.harness import measure
+from common.ingest import ingestSQL
+from common.pool import connect
+
 
 def createAndLoadMySQL(host: str, user: str, password: str, database: str, port: int = 3306):
-    df = pd.read_csv("../dias_catalogue.csv")
+    df = loadCatalogue("../dias_catalogue.csv", compact=False)
     df = df.replace('', None)
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
 
@@ -23,7 +29,7 @@ def createAndLoadMySQL(host: str, user: str, password: str, database: str, port:
         
     df.insert(0, 'id', range(1, len(df) + 1))
 
-    df.to_sql(name='clusters', con=engine, if_exists='replace', index=False)
+    ingestSQL(engine, df, 'clusters', replace=True, overrides={'id': 'INT'})
     
     with engine.connect() as conn:
         conn.execute(text("ALTER TABLE clusters ADD PRIMARY KEY (id)"))
@@ -31,13 +37,7 @@ def createAndLoadMySQL(host: str, user: str, password: str, database: str, port:
 
 def createConnection(host: str, user: str, password: str, database: str, autocommit: bool = True):
     try:
-        mydb = mysql.connector.connect(
-            host=host,
-            user=user,
-            password=password,
-            database=database,
-            autocommit=autocommit
-        )
+        mydb = connect(host, user, password, database, autocommit=autocommit)
         if mydb.is_connected():
             print(f"Connected to MySQL database '{database}'")
         return mydb
@@ -46,11 +46,10 @@ def createConnection(host: str, user: str, password: str, database: str, autocom
 
 #--------------------------------------------------------------#
 
+#   Whatever func returns is fetched in full inside the timing (a find() cursor is lazy).
 def timedExecution(func, *args, **kwargs):
-    start_time = time.time()
-    func(*args, **kwargs)
-    end_time = time.time()
-    print(f"Execution time: {end_time - start_time} seconds")
+    _, elapsed = measure(lambda: func(*args, **kwargs))
+    print(f"Execution time: {elapsed} seconds")
 
 def runQuery(connection, query, fetch=False):
     cursor = connection.cursor()
@@ -76,8 +75,8 @@ def main():
     createAndLoadMySQL("localhost", "root", "root", "openclusters")
     conn = createConnection("localhost", "root", "root", "openclusters")
 
-    # Needed due to max key length being exceeded. Text changed to maximum of 50 chars.
-    runQuery(conn, "ALTER TABLE clusters MODIFY COLUMN Name VARCHAR(50);")
+    # Name is created as VARCHAR of its longest value (see common.schema), so it fits in the
+    # composite index without the former ALTER TABLE ... MODIFY COLUMN Name VARCHAR(50).
 
     query = "EXPLAIN SELECT * FROM clusters WHERE Name LIKE 'D%' AND RA_ICRS > 1 AND DE_ICRS < 25;"
 
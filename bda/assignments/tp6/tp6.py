@@ -1,17 +1,23 @@
 
-import time
+import os
+import sys
 from copy import Error
 
-import mysql.connector
 import numpy as np
 import pandas as pd
 import pymongo as pm
 from pymongo import MongoClient
 from sqlalchemy import create_engine, text
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.catalogue import loadCatalogue
+from common.harness import measure
+from common.ingest import ingestSQL
+from common.pool import connect
+
 
 def createAndLoadMySQL(host: str, user: str, password: str):
-    df = pd.read_csv("../dias_catalogue.csv")
+    df = loadCatalogue("../dias_catalogue.csv", compact=False)
     df = df.replace('', None)
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
 
@@ -25,7 +31,7 @@ def createAndLoadMySQL(host: str, user: str, password: str):
         
     df.insert(0, 'id', range(1, len(df) + 1))
 
-    df.to_sql(name='clusters', con=engine, if_exists='replace', index=False)
+    ingestSQL(engine, df, 'clusters', replace=True, overrides={'id': 'INT'})
     
     with engine.connect() as conn:
         conn.execute(text("ALTER TABLE clusters ADD PRIMARY KEY (id)"))
@@ -33,13 +39,7 @@ def createAndLoadMySQL(host: str, user: str, password: str):
 
 def createConnection(host: str, user: str, password: str, database: str, autocommit: bool = True):
     try:
-        mydb = mysql.connector.connect(
-            host=host,
-            user=user,
-            password=password,
-            database=database,
-            autocommit=autocommit
-        )
+        mydb = connect(host, user, password, database, autocommit=autocommit)
         if mydb.is_connected():
             print(f"Connected to MySQL database '{database}'")
         return mydb
@@ -117,7 +117,7 @@ def showIndexes(connection, table_name):
     cursor.close()
 
 def createClusterCoords(conn):
-    df = pd.read_csv('../dias_catalogue.csv')
+    df = loadCatalogue('../dias_catalogue.csv')
 
     # remove the whitespaces from the strings in "name" column
     df['name'] = df['name'].str.strip()
@@ -193,11 +193,10 @@ def createIndexMongo(col, fields, index_type: str = "asc"):
         return
     col.create_index(index_spec)
 
+#   Whatever func returns is fetched in full inside the timing (a find() cursor is lazy).
 def timedExecution(func, *args, **kwargs):
-    start_time = time.time()
-    func(*args, **kwargs)
-    end_time = time.time()
-    print(f"Execution time: {end_time - start_time} seconds")
+    _, elapsed = measure(lambda: func(*args, **kwargs))
+    print(f"Execution time: {elapsed} seconds")
 
 
 def main():